@@ -0,0 +1,262 @@
+"""
+Headless HTTP/JSON API over the banking core.
+
+    python api_server.py --host 0.0.0.0 --port 8000
+
+Endpoints (the PIN travels in the JSON body, or in an X-Pin header for
+GET/DELETE; never in the URL, which ends up in access logs):
+
+    POST   /accounts                  {"name", "email", "phone", "pin"}
+    POST   /accounts/recover          {"contact": email or phone, "pin"}
+    GET    /accounts/<acc_no>         X-Pin: 1234
+    PATCH  /accounts/<acc_no>         {"pin", "name"?, "email"?, "phone"?, "new_pin"?}
+    DELETE /accounts/<acc_no>         X-Pin: 1234
+    POST   /accounts/<acc_no>/deposit  {"pin", "amount"}
+    POST   /accounts/<acc_no>/withdraw {"pin", "amount"}
+    GET    /accounts/<acc_no>/statement?from=&to=&cursor=&limit=   X-Pin: 1234
+    GET    /health
+    GET    /metrics                   Prometheus text format (see bankcore.metrics)
+
+The server is a single asyncio event loop speaking HTTP/1.1 directly, so
+connections are kept alive and pipelined requests are answered in order
+without a thread per client. Store calls, which may fsync, run in a thread
+pool so a slow disk never blocks the loop; the store's per-account locks
+keep those threads from stepping on each other.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from bankcore import metrics, service
+from bankcore.history import PAGE_SIZE
+from bankcore.storage import shared_store
+
+DATABASE_FILE = 'database.json'
+MAX_BODY = 64 * 1024
+MAX_HEADER = 16 * 1024
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+           404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+log = logging.getLogger("bank.api")
+
+HTTP_REQUESTS = metrics.REGISTRY.add(metrics.Counter(
+    "bank_http_requests_total", "HTTP requests answered, by method and status.", ("method", "status")))
+
+
+def public(account):
+    """The account as returned by the API (the PIN never leaves the server)."""
+    d = account.to_dict()
+    d.pop("pin", None)
+    return d
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def statement_query(query):
+    """(start, end, cursor, limit) from a statement URL's query string."""
+    def first(name):
+        return (query.get(name) or [None])[0]
+    try:
+        start = float(first("from")) if first("from") else None
+        end = float(first("to")) if first("to") else None
+        limit = int(first("limit")) if first("limit") else PAGE_SIZE
+    except ValueError:
+        raise HttpError(400, "from/to must be Unix times and limit a number.") from None
+    return start, end, first("cursor"), limit
+
+
+class BankAPI:
+    """Routes parsed requests to the service functions."""
+
+    def __init__(self, store, executor):
+        self.store = store
+        self.executor = executor
+
+    async def call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(self.store, *args, **kwargs))
+
+    async def handle(self, method, path, headers, body):
+        """Returns (status, payload) for one request."""
+        parts = [p for p in urlsplit(path).path.split("/") if p]
+        query = parse_qs(urlsplit(path).query)
+        pin = body.get("pin") or headers.get("x-pin")
+
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok"}
+        if parts == ["metrics"] and method == "GET":
+            return 200, metrics.REGISTRY.render()
+        if not parts or parts[0] != "accounts" or len(parts) > 3:
+            raise HttpError(404, "Not found.")
+
+        if len(parts) == 1:
+            if method != "POST":
+                raise HttpError(405, "Use POST to create an account.")
+            account = await self.call(service.create_account, body.get("name"), body.get("email"),
+                                      body.get("phone", ""), body.get("pin", ""))
+            return 201, {"account": public(account)}
+
+        if parts == ["accounts", "recover"] and method == "POST":
+            account = await self.call(service.recover_account, body.get("contact"), pin)
+            return 200, {"account": public(account)}
+
+        acc_no = parts[1]
+        if len(parts) == 3 and parts[2] == "statement":
+            if method != "GET":
+                raise HttpError(405, "Use GET for statements.")
+            entries, cursor = await self.call(service.get_statement, acc_no, pin,
+                                              *statement_query(query))
+            return 200, {"transactions": entries, "next_cursor": cursor}
+        if len(parts) == 3:
+            if method != "POST" or parts[2] not in ("deposit", "withdraw"):
+                raise HttpError(404, "Not found.")
+            func = service.deposit if parts[2] == "deposit" else service.withdraw
+            account = await self.call(func, acc_no, pin, body.get("amount"))
+            return 200, {"account": public(account)}
+
+        if method == "GET":
+            account = await self.call(service.details, acc_no, pin)
+        elif method == "PATCH":
+            account = await self.call(service.update_details, acc_no, pin, body.get("name"),
+                                      body.get("email"), body.get("phone"), body.get("new_pin"))
+        elif method == "DELETE":
+            account = await self.call(service.delete_account, acc_no, pin)
+            return 200, {"deleted": account.acc_no}
+        else:
+            raise HttpError(405, "Method not allowed.")
+        return 200, {"account": public(account)}
+
+
+# --- HTTP/1.1 connection handling ---
+
+async def read_request(reader):
+    """Reads one request; returns None when the client closed the connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "Headers too large.")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line.")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+
+    length = headers.get("content-length") or "0"
+    if not (length.isascii() and length.isdigit()):
+        raise HttpError(400, "Invalid Content-Length.")
+    length = int(length)
+    if length > MAX_BODY:
+        raise HttpError(413, "Body too large.")
+    raw = await reader.readexactly(length) if length else b""
+    try:
+        body = json.loads(raw) if raw else {}
+    except ValueError:
+        raise HttpError(400, "Body must be JSON.")
+    if not isinstance(body, dict):
+        raise HttpError(400, "Body must be a JSON object.")
+    return method.upper(), path, version, headers, body
+
+
+def render(status, payload, keep_alive):
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload).encode(), "application/json"
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+def wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+async def serve_connection(api, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except HttpError as err:
+                writer.write(render(err.status, {"error": str(err)}, False))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, path, version, headers, body = request
+            keep_alive = wants_keep_alive(version, headers)
+            try:
+                status, payload = await api.handle(method, path, headers, body)
+            except (HttpError, service.BankError) as err:
+                status, payload = err.status, {"error": str(err)}
+            except Exception:
+                # The details stay in the server log; clients only learn that it failed
+                log.exception("%s %s failed", method, urlsplit(path).path)
+                status, payload = 500, {"error": "Internal error."}
+            HTTP_REQUESTS.inc(1, method, status)
+            writer.write(render(status, payload, keep_alive))
+            # drain() only waits when the client stops reading, so pipelined
+            # requests already buffered are answered back to back
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(host, port, database, workers):
+    store = shared_store(database)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bank-io")
+    api = BankAPI(store, executor)
+    server = await asyncio.start_server(lambda r, w: serve_connection(api, r, w),
+                                        host, port, limit=MAX_HEADER)
+    print(f"Serving the bank API on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the bank.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--database", default=DATABASE_FILE)
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                        help="threads for store calls")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(run(args.host, args.port, args.database, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
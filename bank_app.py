@@ -1,11 +1,21 @@
+from datetime import datetime, timedelta
+
 import streamlit as st
-import json
-import random
-import string
-import os
+
+from bankcore import DEPOSIT_LIMIT, WITHDRAW_LIMIT, open_store, service, shared_store
+from bankcore.account_numbers import allocator_for
+from bankcore.aggregates import TIER_KEYS, tier_label
+from bankcore.accounts import check_new_account, check_unique, contact_locks, new_account_record
+from bankcore.credentials import hash_pin, locked_out
+from bankcore.history import history_for
+from bankcore.transactions import CREDITS, DEPOSIT, WITHDRAW
+from bankcore.sessions import sessions
 
 # --- Constants ---
 DATABASE_FILE = 'database.json'
+SESSION_KEY = 'session_token'
+STATEMENT_KEY = 'statement'
+STATEMENT_PAGE_SIZE = 25
 
 # --- Backend Logic (Refactored for Streamlit) ---
 class BankSystem:
@@ -16,42 +26,113 @@ class BankSystem:
     
     @staticmethod
     def load_data():
-        if os.path.exists(DATABASE_FILE):
-            try:
-                with open(DATABASE_FILE, 'r') as f:
-                    content = f.read()
-                    if content:
-                        return json.loads(content)
-            except Exception as e:
-                st.error(f"Error loading database: {e}")
-        return []
+        """
+        Returns the process-wide account store. Streamlit reruns this script on
+        every interaction, so the database is only parsed again when the files
+        on disk were changed by another process.
+        """
+        try:
+            return shared_store(DATABASE_FILE)
+        except Exception as e:
+            st.error(f"Error loading database: {e}")
+        return open_store(DATABASE_FILE)
 
     @staticmethod
-    def save_data(data):
+    def save_user(data, user):
+        """Persists one new or changed account through the store."""
         try:
-            with open(DATABASE_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
+            data.put(user)
             return True
         except Exception as e:
             st.error(f"Error saving database: {e}")
             return False
 
     @staticmethod
-    def generate_account_no():
-        alpha = random.choices(string.ascii_letters, k=5)
-        digits = random.choices(string.digits, k=4)
-        id_list = alpha + digits
-        random.shuffle(id_list)
-        return "".join(id_list)
+    def delete_user(data, acc_no):
+        try:
+            data.delete(acc_no)
+            return True
+        except Exception as e:
+            st.error(f"Error saving database: {e}")
+            return False
 
     @staticmethod
     def find_user(data, acc_no, pin):
-        """Finds a user and returns the index and the user dict."""
-        for index, user in enumerate(data):
-            # Convert pin to int for comparison as JSON stores/loads inputs
-            if user['Account no.'] == acc_no and str(user['pin']) == str(pin):
-                return index, user
-        return -1, None
+        """Looks the user up in the account index and returns the user dict."""
+        return data.find(acc_no, pin)
+
+    @staticmethod
+    def session_user(data):
+        """The logged-in user, or None (ending the session if it has expired)."""
+        token = st.session_state.get(SESSION_KEY)
+        if token is None:
+            return None
+        user = sessions.account(data, token)
+        if user is None:
+            del st.session_state[SESSION_KEY]
+        return user
+
+    @staticmethod
+    def authenticate(data, acc_no, pin):
+        """The session's user when logged in, otherwise a PIN check."""
+        token = st.session_state.get(SESSION_KEY)
+        if token is not None:
+            return sessions.account(data, token)
+        return BankSystem.find_user(data, acc_no, pin)
+
+    @staticmethod
+    def login_fields(logged_in, acc_label="Account Number", pin_label="PIN"):
+        """Account number and PIN inputs, skipped when a session is open."""
+        if logged_in is not None:
+            st.caption(f"Logged in as {logged_in['Account no.']}")
+            return logged_in['Account no.'], None
+        return st.text_input(acc_label), st.text_input(pin_label, type="password")
+
+
+def login_sidebar(data, logged_in):
+    """Log in once per browser session instead of on every form."""
+    if logged_in is not None:
+        st.sidebar.success(f"Logged in: {logged_in['name']}")
+        if st.sidebar.button("Log out"):
+            sessions.close(st.session_state.pop(SESSION_KEY))
+            st.rerun()
+        return
+    with st.sidebar.form("login_form"):
+        acc_no = st.text_input("Account Number")
+        pin = st.text_input("PIN", type="password")
+        if st.form_submit_button("Log in"):
+            user = None if locked_out(acc_no) else BankSystem.find_user(data, acc_no, pin)
+            if user:
+                st.session_state[SESSION_KEY] = sessions.open(user)
+                st.rerun()
+            else:
+                st.error("Login failed! Check Account No. or PIN.")
+
+def day_start(day):
+    """Unix time of local midnight at the start of ``day`` (None stays None)."""
+    return datetime.combine(day, datetime.min.time()).timestamp() if day else None
+
+
+def show_statement_page(data, query):
+    """Shows the current page of a statement with previous/next buttons."""
+    cursors = query["cursors"]
+    entries, next_cursor = history_for(data).statement(
+        query["acc_no"], query["start"], query["end"], cursors[-1], STATEMENT_PAGE_SIZE)
+    if not entries:
+        st.info("No transactions in this period.")
+        return
+    st.dataframe([{"Date": datetime.fromtimestamp(e["time"]).strftime("%Y-%m-%d %H:%M:%S"),
+                   "Type": e["kind"].capitalize(),
+                   "Amount": e["amount"] if e["kind"] in CREDITS else -e["amount"],
+                   "Balance": e["balance"]} for e in entries],
+                 hide_index=True, use_container_width=True)
+    col1, col2 = st.columns(2)
+    if len(cursors) > 1 and col1.button("⬅ Previous page"):
+        cursors.pop()
+        st.rerun()
+    if next_cursor and col2.button("Next page ➡"):
+        cursors.append(next_cursor)
+        st.rerun()
 
 # --- Streamlit UI ---
 
@@ -61,11 +142,13 @@ def main():
     st.title("🏦 Python Bank System")
     
     # Sidebar Navigation
-    menu = ["Home", "Create Account", "Deposit Money", "Withdraw Money", "Account Details", "Update Details", "Delete Account"]
+    menu = ["Home", "Create Account", "Deposit Money", "Withdraw Money", "Account Details", "Statement", "Update Details", "Recover Account", "Delete Account"]
     choice = st.sidebar.selectbox("Menu", menu)
 
     # Load current data
     data = BankSystem.load_data()
+    logged_in = BankSystem.session_user(data)
+    login_sidebar(data, logged_in)
 
     if choice == "Home":
         st.markdown("""
@@ -76,7 +159,18 @@ def main():
         * **Fast**: Instant updates.
         * **Reliable**: Local JSON storage.
         """)
-        st.info(f"Total Accounts in System: {len(data)}")
+        # Running totals kept by the store, so this doesn't scan the accounts
+        stats = data.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Accounts", f"{stats['accounts']:,}")
+        col2.metric("Total Balance Held", f"₹{stats['total_balance']:,}")
+        col3.metric("Average Balance", f"₹{stats['total_balance'] // max(stats['accounts'], 1):,}")
+        col1, col2 = st.columns(2)
+        col1.metric("Total Credited", f"₹{stats['credited']:,}", help=f"{stats['credits']:,} credits")
+        col2.metric("Total Debited", f"₹{stats['debited']:,}", help=f"{stats['debits']:,} debits")
+        st.caption("Accounts by balance")
+        st.bar_chart([{"Balance (₹)": tier_label(key), "Accounts": stats[key]} for key in TIER_KEYS],
+                     x="Balance (₹)", y="Accounts")
 
     # --- Create Account ---
     elif choice == "Create Account":
@@ -91,26 +185,22 @@ def main():
             submitted = st.form_submit_button("Create Account")
             
             if submitted:
-                # Validation
-                if not name or not email:
-                    st.error("Name and Email are required.")
-                elif len(phone) != 10 or not phone.isnumeric():
-                    st.error("Phone number must be exactly 10 digits.")
-                elif len(pin) != 4 or not pin.isnumeric():
-                    st.error("PIN must be exactly 4 digits.")
+                # Validation (shared with the Tkinter app and bulk import)
+                error = check_new_account(name, email, phone, pin)
+                if error:
+                    st.error(error)
                 else:
-                    # Creation Logic
-                    acc_no = BankSystem.generate_account_no()
-                    new_user = {
-                        "name": name,
-                        "email": email,
-                        "phone no.": int(phone),
-                        "pin": int(pin),
-                        "Account no.": acc_no,
-                        "Balance": 0
-                    }
-                    data.append(new_user)
-                    if BankSystem.save_data(data):
+                    # Creation Logic: the number stays reserved until it is saved
+                    with allocator_for(data).reserve() as (acc_no,):
+                        new_user = new_account_record(name, email, phone, pin, acc_no)
+                        # The email and phone are locked too, so another signup with either waits
+                        with data.transaction_many([acc_no] + contact_locks(email, phone)):
+                            # O(1) through the email/phone indexes
+                            duplicate = check_unique(data, email, phone)
+                            if duplicate:
+                                st.error(duplicate)
+                            saved = not duplicate and BankSystem.save_user(data, new_user)
+                    if saved:
                         st.success("Account Created Successfully!")
                         st.balloons()
                         st.markdown(f"""
@@ -125,64 +215,96 @@ def main():
         st.subheader("💰 Deposit Money")
         
         with st.form("deposit_form"):
-            acc_no = st.text_input("Account Number")
-            pin = st.text_input("PIN", type="password")
-            amount = st.number_input("Amount to Deposit", min_value=1, max_value=100000, step=100)
+            acc_no, pin = BankSystem.login_fields(logged_in)
+            amount = st.number_input("Amount to Deposit", min_value=1, max_value=DEPOSIT_LIMIT, step=100)
             
             submitted = st.form_submit_button("Deposit")
             
             if submitted:
-                idx, user = BankSystem.find_user(data, acc_no, pin)
-                if user:
-                    user['Balance'] += amount
-                    data[idx] = user # Update list
-                    BankSystem.save_data(data)
-                    st.success(f"₹{amount} Credited Successfully!")
-                    st.info(f"New Balance: ₹{user['Balance']}")
-                else:
-                    st.error("Authentication Failed! Check Account No. or PIN.")
+                # Lock the account so concurrent sessions can't lose each other's updates
+                with data.transaction(acc_no):
+                    user = BankSystem.authenticate(data, acc_no, pin)
+                    if user:
+                        # Change a copy so memory still matches disk if the write fails
+                        user = user.copy()
+                        user['Balance'] += amount
+                        if BankSystem.save_user(data, user):
+                            history_for(data).record(acc_no, DEPOSIT, amount, user['Balance'])
+                        st.success(f"₹{amount} Credited Successfully!")
+                        st.info(f"New Balance: ₹{user['Balance']}")
+                    else:
+                        st.error("Authentication Failed! Check Account No. or PIN.")
 
     # --- Withdraw Money ---
     elif choice == "Withdraw Money":
         st.subheader("💸 Withdraw Money")
         
         with st.form("withdraw_form"):
-            acc_no = st.text_input("Account Number")
-            pin = st.text_input("PIN", type="password")
-            amount = st.number_input("Amount to Withdraw", min_value=1, max_value=10000, step=100)
+            acc_no, pin = BankSystem.login_fields(logged_in)
+            amount = st.number_input("Amount to Withdraw", min_value=1, max_value=WITHDRAW_LIMIT, step=100)
             
             submitted = st.form_submit_button("Withdraw")
             
             if submitted:
-                idx, user = BankSystem.find_user(data, acc_no, pin)
-                if user:
-                    if user['Balance'] >= amount:
-                        user['Balance'] -= amount
-                        data[idx] = user
-                        BankSystem.save_data(data)
-                        st.success(f"₹{amount} Debited Successfully!")
-                        st.info(f"Remaining Balance: ₹{user['Balance']}")
+                # Lock the account so concurrent sessions can't lose each other's updates
+                with data.transaction(acc_no):
+                    user = BankSystem.authenticate(data, acc_no, pin)
+                    if user:
+                        if user['Balance'] >= amount:
+                            user = user.copy()
+                            user['Balance'] -= amount
+                            if BankSystem.save_user(data, user):
+                                history_for(data).record(acc_no, WITHDRAW, amount, user['Balance'])
+                            st.success(f"₹{amount} Debited Successfully!")
+                            st.info(f"Remaining Balance: ₹{user['Balance']}")
+                        else:
+                            st.error(f"Insufficient Funds! Current Balance: ₹{user['Balance']}")
                     else:
-                        st.error(f"Insufficient Funds! Current Balance: ₹{user['Balance']}")
-                else:
-                    st.error("Authentication Failed! Check Account No. or PIN.")
+                        st.error("Authentication Failed! Check Account No. or PIN.")
 
     # --- Account Details ---
     elif choice == "Account Details":
         st.subheader("📋 Account Details")
         
         with st.form("details_form"):
-            acc_no = st.text_input("Account Number")
-            pin = st.text_input("PIN", type="password")
+            acc_no, pin = BankSystem.login_fields(logged_in)
             submitted = st.form_submit_button("Fetch Details")
             
             if submitted:
-                idx, user = BankSystem.find_user(data, acc_no, pin)
+                user = BankSystem.authenticate(data, acc_no, pin)
                 if user:
-                    st.json(user)
+                    st.json(user.to_dict())
                 else:
                     st.error("User not found! Check credentials.")
 
+    # --- Statement ---
+    elif choice == "Statement":
+        st.subheader("🧾 Account Statement")
+
+        with st.form("statement_form"):
+            acc_no, pin = BankSystem.login_fields(logged_in)
+            col1, col2 = st.columns(2)
+            date_from = col1.date_input("From", value=None)
+            date_to = col2.date_input("To", value=None)
+            submitted = st.form_submit_button("Show Statement")
+
+            if submitted:
+                if BankSystem.authenticate(data, acc_no, pin):
+                    # Pages are fetched one at a time; earlier cursors allow going back
+                    st.session_state[STATEMENT_KEY] = {
+                        "acc_no": acc_no,
+                        "start": day_start(date_from),
+                        "end": day_start(date_to + timedelta(days=1)) if date_to else None,
+                        "cursors": [None],
+                    }
+                else:
+                    st.session_state.pop(STATEMENT_KEY, None)
+                    st.error("Authentication Failed! Check Account No. or PIN.")
+
+        query = st.session_state.get(STATEMENT_KEY)
+        if query and (logged_in is None or query["acc_no"] == logged_in['Account no.']):
+            show_statement_page(data, query)
+
     # --- Update Details ---
     elif choice == "Update Details":
         st.subheader("🔄 Update Information")
@@ -191,8 +313,7 @@ def main():
         with st.form("update_form"):
             col1, col2 = st.columns(2)
             with col1:
-                acc_no = st.text_input("Account Number (Login)")
-                pin = st.text_input("PIN (Login)", type="password")
+                acc_no, pin = BankSystem.login_fields(logged_in, "Account Number (Login)", "PIN (Login)")
             
             st.divider()
             
@@ -205,28 +326,54 @@ def main():
             submitted = st.form_submit_button("Update Profile")
             
             if submitted:
-                idx, user = BankSystem.find_user(data, acc_no, pin)
-                if user:
-                    # Logic from original script: update if new value provided
-                    if new_name: user['name'] = new_name
-                    if new_email: user['email'] = new_email
-                    if new_phone: 
-                        if len(new_phone) == 10 and new_phone.isnumeric():
-                             user['phone no.'] = int(new_phone)
-                        else:
-                            st.warning("New phone number ignored (Invalid format).")
-                    if new_pin:
-                        if len(new_pin) == 4 and new_pin.isnumeric():
-                             user['pin'] = int(new_pin)
-                        else:
-                            st.warning("New PIN ignored (Invalid format).")
+                # Lock the account, and the new email and phone so no one else takes them meanwhile
+                with data.transaction_many([acc_no] + contact_locks(new_email, new_phone)):
+                    user = BankSystem.authenticate(data, acc_no, pin)
+                    duplicate = user and check_unique(data, new_email, new_phone, acc_no)
+                    if duplicate:
+                        st.error(duplicate)
+                    elif user:
+                        # Edit a copy, so the stored record only changes through the put
+                        user = user.copy()
+                        # Logic from original script: update if new value provided
+                        if new_name: user['name'] = new_name
+                        if new_email: user['email'] = new_email
+                        if new_phone: 
+                            if len(new_phone) == 10 and new_phone.isnumeric():
+                                 user['phone no.'] = int(new_phone)
+                            else:
+                                st.warning("New phone number ignored (Invalid format).")
+                        if new_pin:
+                            if len(new_pin) == 4 and new_pin.isnumeric():
+                                 user['pin'] = hash_pin(new_pin)
+                            else:
+                                st.warning("New PIN ignored (Invalid format).")
                     
-                    data[idx] = user
-                    BankSystem.save_data(data)
-                    st.success("Details Updated Successfully!")
-                    st.json(user)
+                        BankSystem.save_user(data, user)
+                        if logged_in is not None and new_pin:
+                            # A PIN change ends other sessions; keep this one
+                            st.session_state[SESSION_KEY] = sessions.open(user)
+                        st.success("Details Updated Successfully!")
+                        st.json(user.to_dict())
+                    else:
+                        st.error("Authentication Failed. Cannot update.")
+
+    # --- Recover Account ---
+    elif choice == "Recover Account":
+        st.subheader("🔑 Forgot Your Account Number?")
+
+        with st.form("recover_form"):
+            contact = st.text_input("Registered Email or Phone Number")
+            pin = st.text_input("PIN", type="password")
+            submitted = st.form_submit_button("Find My Account")
+
+            if submitted:
+                try:
+                    user = service.recover_account(data, contact, pin)
+                except service.BankError as err:
+                    st.error(str(err))
                 else:
-                    st.error("Authentication Failed. Cannot update.")
+                    st.success(f"Your Account Number is: {user['Account no.']}")
 
     # --- Delete Account ---
     elif choice == "Delete Account":
@@ -234,19 +381,21 @@ def main():
         
         with st.form("delete_form"):
             st.warning("This action is permanent and cannot be undone.")
-            acc_no = st.text_input("Account Number")
-            pin = st.text_input("PIN", type="password")
+            acc_no, pin = BankSystem.login_fields(logged_in)
             
             submitted = st.form_submit_button("Permanently Delete Account")
             
             if submitted:
-                idx, user = BankSystem.find_user(data, acc_no, pin)
-                if user:
-                    del data[idx]
-                    BankSystem.save_data(data)
-                    st.success("Account Deleted Successfully.")
-                else:
-                    st.error("Authentication Failed.")
+                # Lock the account so concurrent sessions can't lose each other's updates
+                with data.transaction(acc_no):
+                    user = BankSystem.authenticate(data, acc_no, pin)
+                    if user:
+                        BankSystem.delete_user(data, user['Account no.'])
+                        if st.session_state.get(SESSION_KEY):
+                            sessions.close(st.session_state.pop(SESSION_KEY))
+                        st.success("Account Deleted Successfully.")
+                    else:
+                        st.error("Authentication Failed.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,56 @@
+"""
+Shared banking core used by the Streamlit, Tkinter and console front-ends.
+
+Nothing here imports a UI toolkit, and the names below are imported from
+their modules on first use, so ``import bankcore`` costs next to nothing
+and scripts only pay for the parts (SQLite, the JSON codec, ...) they touch.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "Account": "bankcore.accounts",
+    "AccountNumberAllocator": "bankcore.account_numbers",
+    "AccountIndex": "bankcore.index",
+    "AuthError": "bankcore.service",
+    "BankError": "bankcore.service",
+    "DEPOSIT_LIMIT": "bankcore.transactions",
+    "DuplicateError": "bankcore.service",
+    "JournalStore": "bankcore.storage",
+    "LazyStore": "bankcore.storage",
+    "LedgerStore": "bankcore.storage",
+    "LockedOut": "bankcore.service",
+    "PinVerifier": "bankcore.credentials",
+    "SQLiteStore": "bankcore.sqlite_store",
+    "SessionCache": "bankcore.sessions",
+    "ShardPool": "bankcore.shards",
+    "ShardedStore": "bankcore.shards",
+    "SnapshotStore": "bankcore.storage",
+    "StorageBackend": "bankcore.backend",
+    "TransactionHistory": "bankcore.history",
+    "WITHDRAW_LIMIT": "bankcore.transactions",
+    "allocator_for": "bankcore.account_numbers",
+    "apply_batch": "bankcore.transactions",
+    "hash_pin": "bankcore.credentials",
+    "history_for": "bankcore.history",
+    "open_store": "bankcore.storage",
+    "run_end_of_day": "bankcore.eod",
+    "scan_snapshot": "bankcore.storage",
+    "shared_store": "bankcore.storage",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module 'bankcore' has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
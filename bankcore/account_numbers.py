@@ -0,0 +1,87 @@
+"""
+Account number allocation.
+
+Numbers keep their familiar shape (5 letters and 4 digits in random order)
+but are drawn from the OS CSPRNG instead of ``random``, and every candidate
+is checked against the account index and against numbers already handed out
+but not yet saved. Both checks are hash lookups, and with roughly 4.8e14
+possible numbers a redraw is almost never needed, so allocation is O(1).
+"""
+
+import random
+import threading
+import weakref
+from contextlib import contextmanager
+
+# The OS CSPRNG (what secrets.SystemRandom is), without importing secrets
+_rng = random.SystemRandom()
+
+# string.ascii_letters and string.digits; importing string pulls in re
+LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+DIGITS = '0123456789'
+
+
+def random_account_no():
+    """Draws one 9-character account number from the CSPRNG."""
+    id_list = _rng.choices(LETTERS, k=5) + _rng.choices(DIGITS, k=4)
+    _rng.shuffle(id_list)
+    return "".join(id_list)
+
+
+class AccountNumberAllocator:
+    """
+    Hands out account numbers that are unique within the store.
+
+    A number is reserved from the moment it is allocated until it is
+    released, normally right after the new account has been saved, so two
+    sessions creating accounts at once can't receive the same one.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._reserved = set()
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        return self.allocate_block(1)[0]
+
+    def allocate_block(self, count):
+        """Reserves ``count`` fresh numbers at once, e.g. for a bulk import."""
+        block = []
+        # A store holding only some shards (bankcore.shards) takes only their numbers
+        owns = getattr(self.store, "owns", None)
+        with self._lock:
+            while len(block) < count:
+                acc_no = random_account_no()
+                if acc_no in self._reserved or (owns and not owns(acc_no)) or acc_no in self.store:
+                    continue
+                self._reserved.add(acc_no)
+                block.append(acc_no)
+        return block
+
+    def release(self, acc_nos):
+        """Drops reservations once the accounts are saved (or abandoned)."""
+        with self._lock:
+            self._reserved.difference_update(acc_nos)
+
+    @contextmanager
+    def reserve(self, count=1):
+        """Allocates a block for the duration of a ``with`` block."""
+        block = self.allocate_block(count)
+        try:
+            yield block
+        finally:
+            self.release(block)
+
+
+_allocators = weakref.WeakKeyDictionary()
+_allocators_lock = threading.Lock()
+
+
+def allocator_for(store):
+    """The shared allocator for a store, so reservations are seen by everyone."""
+    with _allocators_lock:
+        allocator = _allocators.get(store)
+        if allocator is None:
+            allocator = _allocators[store] = AccountNumberAllocator(store)
+        return allocator
@@ -0,0 +1,183 @@
+"""Account records: creation rules and the database.json schema."""
+
+from bankcore.credentials import hash_pin
+
+# database.json key -> Account attribute, in the on-disk key order
+FIELDS = {
+    "name": "name",
+    "email": "email",
+    "phone no.": "phone",
+    "pin": "pin",
+    "Account no.": "acc_no",
+    "Balance": "balance",
+}
+
+
+class Account:
+    """
+    One account, stored in ``__slots__`` instead of a per-account dict.
+
+    Core code uses the attributes (``acc.balance``). The front-ends can keep
+    using the database.json keys (``acc['Balance']``, ``acc.items()``) since
+    the record also behaves like a read/write mapping over those keys. Keys
+    outside the schema survive a load/save round trip in ``extra``.
+    """
+
+    __slots__ = ("name", "email", "phone", "pin", "acc_no", "balance", "extra")
+
+    def __init__(self, name, email, phone, pin, acc_no, balance=0, extra=None):
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.pin = pin
+        self.acc_no = acc_no
+        self.balance = balance
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        """Builds an Account from a database.json record."""
+        extra = {k: v for k, v in d.items() if k not in FIELDS} if len(d) > len(FIELDS) else None
+        return cls(d.get("name"), d.get("email"), d.get("phone no."), d.get("pin"),
+                   d["Account no."], d.get("Balance", 0), extra or None)
+
+    def to_dict(self):
+        """The database.json record for this account."""
+        d = {
+            "name": self.name,
+            "email": self.email,
+            "phone no.": self.phone,
+            "pin": self.pin,
+            "Account no.": self.acc_no,
+            "Balance": self.balance
+        }
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def copy(self):
+        return Account(self.name, self.email, self.phone, self.pin, self.acc_no,
+                       self.balance, dict(self.extra) if self.extra else None)
+
+    # --- Mapping view over the database.json keys ---
+
+    def __getitem__(self, key):
+        attr = FIELDS.get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        attr = FIELDS.get(key)
+        if attr is not None:
+            setattr(self, attr, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in FIELDS or bool(self.extra) and key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(FIELDS) + list(self.extra or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __eq__(self, other):
+        if not isinstance(other, Account):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Account({self.to_dict()!r})"
+
+
+def as_account(record):
+    """Accepts an Account or a database.json-style dict and returns an Account."""
+    return record if isinstance(record, Account) else Account.from_dict(record)
+
+
+def check_new_account(name, email, phone, pin):
+    """
+    Validates the fields of a new account.
+
+    Returns an error message, or None if the account can be created. Phone
+    and PIN are checked as digit strings so "0123" isn't mistaken for a
+    3-digit PIN after int() conversion.
+    """
+    if not name or not email:
+        return "Name and Email are required."
+    phone, pin = str(phone).strip(), str(pin).strip()
+    if len(phone) != 10 or not phone.isnumeric():
+        return "Phone number must be exactly 10 digits."
+    if len(pin) != 4 or not pin.isnumeric():
+        return "PIN must be exactly 4 digits."
+    return None
+
+
+def email_key(email):
+    """The form emails are compared in: trimmed and lower-cased (None if blank)."""
+    key = str(email or "").strip().lower()
+    return key or None
+
+
+def phone_key(phone):
+    """Phones are stored as ints, so compare them as ints (None if not a number)."""
+    text = str(phone if phone is not None else "").strip()
+    return int(text) if text.isdigit() else None
+
+
+CONTACT_LOCK_PREFIXES = ("email:", "phone:")
+
+
+def contact_locks(email=None, phone=None):
+    """
+    Lock keys for an email and phone number, to pass to ``transaction_many``
+    along with the account number. Two writers claiming the same email then
+    exclude each other even when their accounts hash to different stripes.
+    """
+    keys = []
+    if email_key(email):
+        keys.append("email:" + email_key(email))
+    if phone_key(phone) is not None:
+        keys.append(f"phone:{phone_key(phone)}")
+    return keys
+
+
+def check_unique(store, email=None, phone=None, acc_no=None):
+    """
+    Checks that no account other than ``acc_no`` already uses ``email`` or
+    ``phone``, through the store's secondary indexes.
+
+    Returns an error message, or None if both are free. Call it inside a
+    ``transaction_many`` that includes ``contact_locks(email, phone)``, or a
+    concurrent writer can take the same email between the check and the put.
+    """
+    if email and any(other != acc_no for other in store.accounts_by_email(email)):
+        return "An account with this email already exists."
+    if phone and any(other != acc_no for other in store.accounts_by_phone(phone)):
+        return "An account with this phone number already exists."
+    return None
+
+
+def new_account_record(name, email, phone, pin, acc_no, pin_hash=None):
+    """
+    Builds a fresh account with a zero balance and a hashed PIN (``pin_hash``
+    when the caller already hashed it, e.g. a batch hashed in parallel).
+    """
+    return Account(name, email, int(phone), pin_hash or hash_pin(pin), acc_no, 0)
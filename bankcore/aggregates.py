@@ -0,0 +1,101 @@
+"""
+Running totals over all accounts, for the dashboard.
+
+``Aggregates`` is updated with each account change as it is applied:
+``change(old_balance, new_balance)``, with None for an account that is new
+or deleted. It tracks:
+
+* ``accounts`` and ``total_balance``;
+* ``balance_<floor>``: accounts per balance tier (see ``TIERS``);
+* ``credited``/``credits`` and ``debited``/``debits``: money that went into
+  and out of existing accounts, and how many changes did it. These come from
+  balance differences, so a batch that credits and debits one account in the
+  same write counts only the net change. An account's opening balance is
+  not a credit.
+
+The balance totals follow from the accounts themselves, so stores rebuild
+them whenever they read every account anyway. The money flows don't, so
+the JSON stores save the totals to ``<database>.stats.json`` each time they
+write the snapshot and carry on from there on the next load.
+"""
+
+import bisect
+import os
+import threading
+
+from bankcore import codec
+
+# Lower bound of each balance tier
+TIERS = (0, 1000, 10000, 100000)
+FLOWS = ("credited", "credits", "debited", "debits")
+TIER_KEYS = tuple(f"balance_{floor}" for floor in TIERS)
+FIELDS = ("accounts", "total_balance") + TIER_KEYS + FLOWS
+
+
+def tier_key(balance):
+    """The ``balance_<floor>`` key of the tier a balance falls in."""
+    return f"balance_{TIERS[max(bisect.bisect_right(TIERS, balance) - 1, 0)]}"
+
+
+def tier_label(key):
+    """A tier key as a range for display, e.g. "1,000 - 9,999"."""
+    i = TIERS.index(int(key.rsplit("_", 1)[1]))
+    if i == len(TIERS) - 1:
+        return f"{TIERS[i]:,}+"
+    return f"{TIERS[i]:,} - {TIERS[i + 1] - 1:,}"
+
+
+class Aggregates:
+    """The bank-wide totals, kept up to date one account change at a time."""
+
+    def __init__(self, values=None):
+        self.values = dict.fromkeys(FIELDS, 0)
+        if values:
+            self.values.update((key, values[key]) for key in FIELDS if key in values)
+        self._lock = threading.Lock()
+
+    def change(self, old, new):
+        """Applies one account going from balance ``old`` to ``new`` (None: absent)."""
+        with self._lock:
+            self._change(self.values, old, new)
+
+    @staticmethod
+    def _change(values, old, new):
+        if old is not None:
+            values["accounts"] -= 1
+            values["total_balance"] -= old
+            values[tier_key(old)] -= 1
+        if new is not None:
+            values["accounts"] += 1
+            values["total_balance"] += new
+            values[tier_key(new)] += 1
+        if old is not None and new is not None and old != new:
+            if new > old:
+                values["credited"] += new - old
+                values["credits"] += 1
+            else:
+                values["debited"] += old - new
+                values["debits"] += 1
+
+    def restore_flows(self, values):
+        """Takes the money flows from saved totals (the rest is recomputed)."""
+        with self._lock:
+            self.values.update((key, values[key]) for key in FLOWS if key in values)
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self.values)
+
+
+def stats_path(path):
+    """The saved totals that sit next to a JSON database path."""
+    return os.path.splitext(path)[0] + '.stats.json'
+
+
+def read_stats(path):
+    """Saved totals as a dict; empty if there are none (or they are unreadable)."""
+    try:
+        with open(path, 'rb') as fs:
+            return codec.loads(fs.read())
+    except (OSError,) + codec.DecodeError:
+        return {}
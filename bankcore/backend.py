@@ -0,0 +1,98 @@
+"""The interface every account storage backend implements."""
+
+from bankcore.accounts import email_key, phone_key
+from bankcore.aggregates import Aggregates
+from bankcore.credentials import verify_pin
+from bankcore.metrics import timed_call
+
+
+class StorageBackend:
+    """
+    Account storage as seen by the front-ends.
+
+    Records are ``Account`` objects, which also read like dicts in the
+    database.json schema ("name", "email", "phone no.", "pin", "Account no.",
+    "Balance"); ``put`` accepts either form. Changes to a record only become
+    durable once it is passed back to ``put``; read-modify-write cycles
+    should run inside ``transaction``.
+    """
+
+    def load(self):
+        """Prepares the backend for use and returns it."""
+        return self
+
+    def is_stale(self):
+        """True if another writer changed the data since we last looked."""
+        return False
+
+    def refresh(self):
+        """Picks up changes made by other writers."""
+
+    def transaction(self, acc_no):
+        """Context manager locking one account; yields its current record."""
+        raise NotImplementedError
+
+    def transaction_many(self, acc_nos):
+        """Context manager locking several accounts for one batch."""
+        raise NotImplementedError
+
+    def exclusive(self):
+        """Context manager locking every account, for jobs over the whole bank."""
+        return self.transaction_many([record.acc_no for record in self])
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def __contains__(self, acc_no):
+        return self.get(acc_no) is not None
+
+    def get(self, acc_no):
+        """Returns the record for an account number, or None."""
+        raise NotImplementedError
+
+    @timed_call
+    def find(self, acc_no, pin):
+        """Returns the record if the account exists and the PIN matches."""
+        record = self.get(acc_no)
+        if record is not None and verify_pin(record, pin):
+            return record
+        return None
+
+    def accounts_by_email(self, email):
+        """Account numbers registered with ``email``; backends index this."""
+        key = email_key(email)
+        return [record.acc_no for record in self if key and email_key(record.email) == key]
+
+    def accounts_by_phone(self, phone):
+        """Account numbers registered with ``phone``; backends index this."""
+        key = phone_key(phone)
+        return [record.acc_no for record in self if key and phone_key(record.phone) == key]
+
+    def stats(self):
+        """
+        The dashboard totals (see bankcore.aggregates) as a dict. The built-in
+        backends keep them up to date as they go; this fallback counts.
+        """
+        totals = Aggregates()
+        for record in self:
+            totals.change(None, record.balance)
+        return totals.to_dict()
+
+    def put(self, record):
+        """Stores a new or changed account record durably."""
+        raise NotImplementedError
+
+    def put_many(self, records):
+        """Stores several records; backends override this to persist once."""
+        for record in records:
+            self.put(record)
+
+    def delete(self, acc_no):
+        """Removes an account durably and returns its record (or None)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
@@ -0,0 +1,304 @@
+"""
+Benchmarks for the banking core.
+
+    python -m bankcore.bench                                  # 1k/10k/100k, all modes
+    python -m bankcore.bench --sizes 1000,1000000 --modes journal,sqlite
+    python -m bankcore.bench --output bench.json --compare last-release.json
+    python -m bankcore.bench --startup                        # cold start of the entry points
+
+For every storage mode and database size a synthetic database is generated
+in a temporary directory, then each operation the front-ends perform is
+timed on its own: load, find_user, get_details, deposit, withdraw,
+create_account and delete_account. These go through the same store calls
+as ``Bank`` in newui.py and ``BankSystem`` in bank_app.py (authenticate,
+transaction, put/delete). For each one the report gives ops/sec, p50 and
+p99 latency, and the peak traced memory allocated while it ran.
+
+With ``--startup`` the cold start of each entry module is measured instead:
+the time to import it in a fresh interpreter, and the wall time of the whole
+process, over ``STARTUP_RUNS`` runs.
+
+Results are written as JSON. With ``--compare`` a previous run is loaded
+and any operation whose p50 got slower by more than ``--threshold`` is
+reported, with a non-zero exit status so CI can catch regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bankcore.account_numbers import allocator_for
+from bankcore.accounts import new_account_record
+from bankcore.migrate import migrate
+from bankcore.shards import DEFAULT_SHARDS, rebalance
+from bankcore.storage import STORE_MODES, open_store
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_OPS = 200
+MEMORY_SAMPLES = 20
+PIN = 1234
+STARTUP_RUNS = 10
+STARTUP_MODULES = ("bankcore", "bankcore.service", "bankcore.storage", "main", "newui", "api_server")
+STARTUP_SNIPPET = (
+    "import importlib, sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "importlib.import_module(sys.argv[1])\n"
+    "print(time.perf_counter() - t0)\n"
+)
+
+
+# --- Synthetic data ---
+
+def write_database(path, size, seed=0):
+    """Writes a database.json with ``size`` synthetic accounts; returns their numbers."""
+    rng = random.Random(seed)
+    acc_nos = [f"B{i:08d}" for i in range(size)]
+    with open(path, 'w') as fs:
+        fs.write("[")
+        for i, acc_no in enumerate(acc_nos):
+            record = {"name": f"User {i}", "email": f"user{i}@example.com",
+                      "phone no.": 9000000000 + i, "pin": PIN,
+                      "Account no.": acc_no, "Balance": rng.randrange(0, 1000000)}
+            fs.write((", " if i else "") + json.dumps(record))
+        fs.write("]")
+    return acc_nos
+
+
+# --- Operations (one call = one timed sample) ---
+
+def op_find_user(store, acc_no):
+    store.find(acc_no, PIN)
+
+
+def op_get_details(store, acc_no):
+    store.find(acc_no, PIN).to_dict()
+
+
+def op_deposit(store, acc_no):
+    with store.transaction(acc_no):
+        user = store.find(acc_no, PIN)
+        user.balance += 100
+        store.put(user)
+
+
+def op_withdraw(store, acc_no):
+    with store.transaction(acc_no):
+        user = store.find(acc_no, PIN)
+        if user.balance >= 1:
+            user.balance -= 1
+        store.put(user)
+
+
+def op_create_account(store, acc_no):
+    with allocator_for(store).reserve() as (new_acc_no,):
+        record = new_account_record("Bench User", "bench@example.com", "9999999999", str(PIN), new_acc_no)
+        with store.transaction(new_acc_no):
+            store.put(record)
+
+
+def op_delete_account(store, acc_no):
+    with store.transaction(acc_no):
+        store.delete(acc_no)
+
+
+OPERATIONS = {
+    "find_user": op_find_user,
+    "get_details": op_get_details,
+    "deposit": op_deposit,
+    "withdraw": op_withdraw,
+    "create_account": op_create_account,
+    "delete_account": op_delete_account,
+}
+
+
+# --- Measurement ---
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(mode, size, op, samples, peak):
+    total = sum(samples)
+    return {
+        "mode": mode,
+        "size": size,
+        "op": op,
+        "samples": len(samples),
+        "ops_per_sec": round(len(samples) / total, 1) if total else None,
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p99_us": round(percentile(samples, 99) * 1e6, 1),
+        "mean_us": round(statistics.fmean(samples) * 1e6, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def print_result(r):
+    print(f"{r['mode']:>8} {r['size']:>8} {r['op']:<15} {r['ops_per_sec']:>12} ops/s  "
+          f"p50 {r['p50_us']:>10} us  p99 {r['p99_us']:>10} us  peak {r['peak_kb']:>10} KiB",
+          file=sys.stderr)
+
+
+def time_calls(func, args_list, max_seconds):
+    """Times each call; stops early (after at least 5) once the budget is used up."""
+    samples = []
+    started = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - t0)
+        if len(samples) >= 5 and time.perf_counter() - started > max_seconds:
+            break
+    return samples
+
+
+def peak_memory(func, args_list):
+    """Peak bytes traced while running a few calls of ``func``."""
+    tracemalloc.start()
+    try:
+        for args in args_list:
+            func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_mode(mode, size, workdir, ops, max_seconds, seed):
+    db_path = os.path.join(workdir, "database.json")
+    acc_nos = write_database(db_path, size, seed)
+    if mode == "sqlite":
+        migrate(db_path)
+    elif mode == "sharded":
+        rebalance(db_path, int(os.environ.get("BANK_SHARDS", DEFAULT_SHARDS)))
+
+    results = []
+    load_samples = time_calls(lambda: open_store(db_path, mode).load().close(), [()] * 5, max_seconds)
+    load_peak = peak_memory(lambda: open_store(db_path, mode).load().close(), [()])
+    results.append(summarize(mode, size, "load", load_samples, load_peak))
+    print_result(results[-1])
+
+    store = open_store(db_path, mode).load()
+    rng = random.Random(seed)
+    try:
+        for name, func in OPERATIONS.items():
+            if name == "delete_account":
+                # Delete distinct accounts, never one a later sample needs
+                targets = rng.sample(acc_nos, min(ops + MEMORY_SAMPLES, len(acc_nos)))
+            else:
+                targets = [rng.choice(acc_nos) for _ in range(ops + MEMORY_SAMPLES)]
+            samples = time_calls(func, [(store, t) for t in targets[:ops]], max_seconds)
+            peak = peak_memory(func, [(store, t) for t in targets[ops:]])
+            results.append(summarize(mode, size, name, samples, peak))
+            print_result(results[-1])
+    finally:
+        store.close()
+    return results
+
+
+def bench_startup(modules, runs, workdir):
+    """Import time and process wall time of each module, in fresh interpreters."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get("PYTHONPATH")))))
+    results = []
+    for module in modules:
+        imports, walls = [], []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET, module], cwd=workdir,
+                                  env=env, capture_output=True, text=True)
+            walls.append(time.perf_counter() - t0)
+            if proc.returncode:
+                break
+            imports.append(float(proc.stdout.split()[-1]))
+        if proc.returncode:
+            print(f"skipping {module}: {proc.stderr.strip().splitlines()[-1]}", file=sys.stderr)
+            continue
+        for op, samples in ((f"import {module}", imports), (f"process {module}", walls)):
+            results.append(summarize("startup", 0, op, samples, 0))
+            print_result(results[-1])
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Returns the operations whose p50 regressed by more than ``threshold``."""
+    with open(baseline_path) as fs:
+        baseline = {(r["mode"], r["size"], r["op"]): r for r in json.load(fs)["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get((r["mode"], r["size"], r["op"]))
+        if old and old["p50_us"] and r["p50_us"] > old["p50_us"] * (1 + threshold):
+            regressions.append((r["mode"], r["size"], r["op"], old["p50_us"], r["p50_us"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the banking core.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated account counts (e.g. 1000,1000000)")
+    parser.add_argument("--modes", default=",".join(STORE_MODES))
+    parser.add_argument("--ops", type=int, default=DEFAULT_OPS, help="samples per operation")
+    parser.add_argument("--max-seconds", type=float, default=10.0,
+                        help="time budget per operation (slow modes stop early)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed p50 slowdown before --compare fails (0.2 = 20%%)")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure cold start of the entry modules instead of the operations")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    modes = args.modes.split(",")
+    results = []
+    if args.startup:
+        # Only the startup timings; the loop below has no sizes to run
+        sizes, modes = [], ["startup"]
+        workdir = tempfile.mkdtemp(prefix="bankbench-")
+        try:
+            results.extend(bench_startup(STARTUP_MODULES, STARTUP_RUNS, workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    for mode in modes:
+        for size in sizes:
+            workdir = tempfile.mkdtemp(prefix="bankbench-")
+            try:
+                results.extend(bench_mode(mode, size, workdir, args.ops, args.max_seconds, args.seed))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": sizes,
+            "modes": modes,
+            "ops": args.ops,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w') as fs:
+        json.dump(report, fs, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for mode, size, op, old, new in regressions:
+            print(f"REGRESSION {mode}/{size}/{op}: p50 {old} us -> {new} us", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
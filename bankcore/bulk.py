@@ -0,0 +1,208 @@
+"""
+Streaming bulk import and export of accounts.
+
+    python -m bankcore.bulk import partners.csv --results results.jsonl
+    python -m bankcore.bulk export ledger.jsonl
+
+Input rows are read lazily (CSV with name,email,phone,pin columns, or JSONL
+objects with the same keys; "phone no." is accepted too), validated with
+the same rules as the front-ends and saved ``chunk_size`` accounts at a
+time, so a file of any size never becomes one big list. Results and
+exports are written out chunk by chunk as well. Each chunk's PINs are
+hashed in parallel over a process pool (``--workers``), since one hash is
+deliberately slow.
+
+Every row still ends up in the store, so memory for the accounts
+themselves is only bounded with BANK_STORAGE=sqlite; the JSON modes keep
+the full index in memory. Journal mode appends each chunk with one fsync,
+while snapshot mode rewrites database.json once per chunk.
+"""
+
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bankcore.account_numbers import allocator_for
+from bankcore.accounts import (check_new_account, check_unique, contact_locks, email_key, new_account_record,
+                               phone_key)
+from bankcore.credentials import hash_pin
+from bankcore.storage import open_store
+
+DEFAULT_CHUNK_SIZE = 10000
+EXPORT_FIELDS = ("Account no.", "name", "email", "phone no.", "Balance")
+
+
+# --- Reading and writing rows ---
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_rows(path, fmt=None):
+    """Yields one dict per input row."""
+    fmt = detect_format(path, fmt)
+    with open(path, newline='' if fmt == "csv" else None) as fs:
+        if fmt == "csv":
+            yield from csv.DictReader(fs)
+        else:
+            for line in fs:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(iterable, size):
+    """Groups an iterable into lists of at most ``size`` items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RowWriter:
+    """Writes dict rows as CSV or JSONL, one ``write_many`` call per chunk."""
+
+    def __init__(self, fs, fmt, fields):
+        self._fs = fs
+        self._csv = csv.DictWriter(fs, fieldnames=fields, extrasaction='ignore') if fmt == "csv" else None
+        if self._csv:
+            self._csv.writeheader()
+
+    def write_many(self, rows):
+        if self._csv:
+            self._csv.writerows(rows)
+        else:
+            self._fs.write("".join(json.dumps(row) + "\n" for row in rows))
+        self._fs.flush()
+
+
+# --- Import ---
+
+def import_accounts(store, rows, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Creates accounts from an iterable of input rows.
+
+    Yields one result per row ({"row", "ok", "account"/"error"}) as each
+    chunk is saved, so callers can stream the results out too. PINs are
+    hashed by ``workers`` processes (default: CPU count).
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        yield from _import_chunks(store, rows, chunk_size, pool)
+
+
+def _import_chunks(store, rows, chunk_size, pool):
+    allocator = allocator_for(store)
+    numbered = enumerate(rows, start=1)
+    for chunk in chunked(numbered, chunk_size):
+        results = []
+        valid = []
+        # Rows of this chunk aren't in the store's indexes yet
+        emails, phones = set(), set()
+        for line_no, row in chunk:
+            phone = row.get("phone", row.get("phone no.", ""))
+            error = (check_new_account(row.get("name"), row.get("email"), phone, row.get("pin", ""))
+                     or check_unique(store, row.get("email"), phone))
+            if not error and (email_key(row["email"]) in emails or phone_key(phone) in phones):
+                error = "Email or phone number repeats an earlier row."
+            if error:
+                results.append({"row": line_no, "ok": False, "error": error})
+            else:
+                results.append({"row": line_no, "ok": True})
+                emails.add(email_key(row["email"]))
+                phones.add(phone_key(phone))
+                valid.append((results[-1], row, str(phone).strip()))
+
+        if valid:
+            hashes = list(pool.map(hash_pin, [str(row["pin"]).strip() for _, row, _ in valid], chunksize=64))
+            # One block of numbers per chunk instead of one allocation per row
+            with allocator.reserve(len(valid)) as acc_nos:
+                records = []
+                locks = list(acc_nos)
+                for (result, row, phone), acc_no, pin_hash in zip(valid, acc_nos, hashes):
+                    records.append((result, new_account_record(row["name"], row["email"], phone,
+                                                               None, acc_no, pin_hash)))
+                    locks += contact_locks(row["email"], phone)
+                with store.transaction_many(locks):
+                    # Checked again under the email/phone locks: another writer
+                    # may have taken one while the PINs were hashed
+                    saved = []
+                    for result, record in records:
+                        error = check_unique(store, record.email, record.phone)
+                        if error:
+                            result.update(ok=False, error=error)
+                        else:
+                            result["account"] = record.acc_no
+                            saved.append(record)
+                    if saved:
+                        store.put_many(saved)
+        yield from results
+
+
+def export_accounts(store, fs, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Streams every account (without its PIN) to ``fs``; returns the count."""
+    writer = RowWriter(fs, fmt, EXPORT_FIELDS)
+    count = 0
+    for chunk in chunked(iter(store), chunk_size):
+        writer.write_many({field: record.get(field) for field in EXPORT_FIELDS} for record in chunk)
+        count += len(chunk)
+    return count
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of bank accounts.")
+    parser.add_argument("--database", default="database.json")
+    parser.add_argument("--storage", help="snapshot, journal, sqlite, ledger or sharded (default: $BANK_STORAGE)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, help="PIN hashing processes (default: CPU count)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    imp = commands.add_parser("import", help="create accounts from a CSV/JSONL file")
+    imp.add_argument("source")
+    imp.add_argument("--format", choices=("csv", "jsonl"))
+    imp.add_argument("--results", help="where to write per-row results (default: stdout)")
+
+    exp = commands.add_parser("export", help="write all accounts to a CSV/JSONL file")
+    exp.add_argument("target", help="output file, or - for stdout")
+    exp.add_argument("--format", choices=("csv", "jsonl"))
+
+    args = parser.parse_args(argv)
+    store = open_store(args.database, args.storage).load()
+    try:
+        if args.command == "import":
+            out = open(args.results, 'w', newline='') if args.results else sys.stdout
+            results_fmt = detect_format(args.results) if args.results else "jsonl"
+            writer = RowWriter(out, results_fmt, ("row", "ok", "account", "error"))
+            created = failed = 0
+            results = import_accounts(store, read_rows(args.source, args.format), args.chunk_size,
+                                      args.workers)
+            for chunk in chunked(results, args.chunk_size):
+                writer.write_many(chunk)
+                ok = sum(1 for result in chunk if result["ok"])
+                created += ok
+                failed += len(chunk) - ok
+            if out is not sys.stdout:
+                out.close()
+            print(f"Created {created} accounts, rejected {failed} rows.", file=sys.stderr)
+        else:
+            fmt = detect_format(args.target, args.format)
+            if args.target == "-":
+                count = export_accounts(store, sys.stdout, args.format or "jsonl", args.chunk_size)
+            else:
+                with open(args.target, 'w', newline='') as fs:
+                    count = export_accounts(store, fs, fmt, args.chunk_size)
+            print(f"Exported {count} accounts.", file=sys.stderr)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+JSON encoding for database.json and the write-ahead log.
+
+Uses orjson or msgspec when one is installed and the standard library
+otherwise; ``BANK_JSON_CODEC=json`` forces the standard library. Whatever is
+picked, ``dumps`` returns compact UTF-8 bytes and ``loads`` accepts bytes or
+str, so files written by one codec are read by any other. The choice (and
+the import of orjson/msgspec) happens on first use of ``dumps``, ``loads``,
+``DecodeError`` or ``NAME``.
+
+``iter_array`` parses a top-level JSON array one element at a time, which
+lets a lookup or a count walk database.json without materializing every
+account first.
+"""
+
+import json
+import os
+
+CHUNK_SIZE = 64 * 1024
+
+_WANTED = os.environ.get("BANK_JSON_CODEC", "")
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _pick():
+    if _WANTED in ("", "orjson"):
+        try:
+            import orjson
+        except ImportError:
+            pass
+        else:
+            return "orjson", orjson.dumps, orjson.loads, (orjson.JSONDecodeError,)
+    if _WANTED in ("", "msgspec"):
+        try:
+            import msgspec
+        except ImportError:
+            pass
+        else:
+            return "msgspec", msgspec.json.Encoder().encode, msgspec.json.decode, (msgspec.DecodeError,)
+    return "json", _stdlib_dumps, json.loads, ()
+
+
+def __getattr__(name):
+    if name not in ("NAME", "dumps", "loads", "DecodeError"):
+        raise AttributeError(f"module 'bankcore.codec' has no attribute {name!r}")
+    codec_name, dumps, loads, decode_errors = _pick()
+    # DecodeError is everything ``loads`` may raise on malformed input
+    globals().update(NAME=codec_name, dumps=dumps, loads=loads,
+                     DecodeError=(ValueError,) + decode_errors)
+    return globals()[name]
+
+
+def dumps_pretty(obj):
+    """The ``json.dump(indent=4)`` layout database.json has always used."""
+    return json.dumps(obj, indent=4).encode()
+
+
+def iter_array(fs, chunk_size=CHUNK_SIZE):
+    """
+    Yields the elements of the JSON array in the text file ``fs``, reading
+    ``chunk_size`` characters at a time. An empty file is an empty array.
+    """
+    decode = json.JSONDecoder().raw_decode
+    buf = ''
+    while not buf:
+        more = fs.read(chunk_size)
+        if not more:
+            return
+        buf = more.lstrip()
+    if buf[0] != '[':
+        raise ValueError("Expected a JSON array")
+    pos = 1
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            value, end = decode(buf, pos)
+        except ValueError:
+            end = None
+        # A value only counts once a delimiter follows it: one that runs to the
+        # end of the buffer, or a number cut at "1." or "1e", may go on in the
+        # next chunk
+        if end is not None and (eof or (end < len(buf) and buf[end] in ' \t\r\n,]')):
+            yield value
+            pos = end
+            continue
+        if eof:
+            raise ValueError("Unterminated JSON array")
+        more = fs.read(chunk_size)
+        eof = not more
+        buf = buf[pos:] + more
+        pos = 0
@@ -0,0 +1,195 @@
+"""
+PIN hashing, verification cache and lockout.
+
+PINs are stored as ``pbkdf2_sha256$<iterations>$<salt>$<hash>`` strings. The
+cost is tunable with ``BANK_PIN_ITERATIONS`` (new hashes only; existing ones
+keep the cost they were made with). Accounts from before hashing still hold
+the plaintext PIN; they verify as before and get hashed the next time the
+service changes them, or all at once with:
+
+    python -m bankcore.credentials upgrade [--database database.json]
+
+A correct PIN costs one full hash the first time; after that it is
+remembered for ``BANK_PIN_CACHE_TTL`` seconds in a bounded LRU keyed by the
+account, its stored hash (so a PIN change invalidates the entry) and an HMAC
+of the PIN under a per-process key, so no plaintext PIN is kept in memory.
+``BANK_PIN_MAX_FAILURES`` wrong PINs in a row lock the account out for
+``BANK_PIN_LOCKOUT_SECONDS``; the count is per process and lives in memory.
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SCHEME = "pbkdf2_sha256"
+SALT_BYTES = 16
+DEFAULT_ITERATIONS = 60000
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 300.0
+DEFAULT_MAX_FAILURES = 5
+DEFAULT_LOCKOUT_SECONDS = 300.0
+TRACKED_ACCOUNTS = 100000
+
+
+def _canonical(pin):
+    # PINs were stored as ints, so "0123" and 123 have always been the same PIN
+    text = str(pin).strip()
+    return str(int(text)) if text.isdigit() else text
+
+
+def _derive(pin, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", _canonical(pin).encode(), salt, iterations)
+
+
+def hash_pin(pin, iterations=None):
+    """A salted hash of ``pin`` to store in the account's "pin" field."""
+    iterations = iterations or int(os.environ.get("BANK_PIN_ITERATIONS", DEFAULT_ITERATIONS))
+    salt = os.urandom(SALT_BYTES)
+    return f"{SCHEME}${iterations}${salt.hex()}${_derive(pin, salt, iterations).hex()}"
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(SCHEME + "$")
+
+
+def check_pin(stored, pin):
+    """Whether ``pin`` matches the stored hash (or legacy plaintext PIN)."""
+    if is_hashed(stored):
+        _, iterations, salt, digest = stored.split("$")
+        candidate = _derive(pin, bytes.fromhex(salt), int(iterations)).hex()
+        return hmac.compare_digest(candidate, digest)
+    return hmac.compare_digest(_canonical(stored).encode(), _canonical(pin).encode())
+
+
+class PinVerifier:
+    """``check_pin`` behind an LRU of recent successes and a failed-attempt lockout."""
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL,
+                 max_failures=DEFAULT_MAX_FAILURES, lockout_seconds=DEFAULT_LOCKOUT_SECONDS):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.max_failures = max_failures
+        self.lockout_seconds = lockout_seconds
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+        # (acc_no, stored pin, pin tag) -> expiry
+        self._verified = OrderedDict()
+        # acc_no -> [failures in a row, locked until]
+        self._failures = OrderedDict()
+
+    def locked_out(self, acc_no):
+        entry = self._failures.get(acc_no)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def verify(self, acc_no, stored, pin):
+        """Checks ``pin`` for the account; always False while it is locked out."""
+        if self.locked_out(acc_no):
+            return False
+        tag = hmac.new(self._key, _canonical(pin).encode(), "sha256").digest()
+        key = (acc_no, stored, tag)
+        now = time.monotonic()
+        with self._lock:
+            expiry = self._verified.get(key)
+            if expiry is not None:
+                if expiry > now:
+                    self._verified.move_to_end(key)
+                    return True
+                del self._verified[key]
+
+        # The slow part runs outside the lock so other accounts aren't held up
+        ok = check_pin(stored, pin)
+        with self._lock:
+            if ok:
+                self._failures.pop(acc_no, None)
+                self._verified[key] = now + self.ttl
+                if len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+            else:
+                self._failed(acc_no, now)
+        return ok
+
+    def _failed(self, acc_no, now):
+        entry = self._failures.get(acc_no)
+        if entry is None:
+            entry = self._failures[acc_no] = [0, 0.0]
+            if len(self._failures) > TRACKED_ACCOUNTS:
+                self._failures.popitem(last=False)
+        else:
+            self._failures.move_to_end(acc_no)
+        entry[0] += 1
+        if entry[0] >= self.max_failures:
+            entry[0] = 0
+            entry[1] = now + self.lockout_seconds
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+            self._failures.clear()
+
+
+verifier = PinVerifier(
+    cache_size=int(os.environ.get("BANK_PIN_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+    ttl=float(os.environ.get("BANK_PIN_CACHE_TTL", DEFAULT_CACHE_TTL)),
+    max_failures=int(os.environ.get("BANK_PIN_MAX_FAILURES", DEFAULT_MAX_FAILURES)),
+    lockout_seconds=float(os.environ.get("BANK_PIN_LOCKOUT_SECONDS", DEFAULT_LOCKOUT_SECONDS)),
+)
+
+
+def verify_pin(account, pin):
+    """Whether ``pin`` opens ``account`` (through the shared verifier)."""
+    return verifier.verify(account.acc_no, account.pin, pin)
+
+
+def locked_out(acc_no):
+    return verifier.locked_out(acc_no)
+
+
+# --- Upgrading plaintext PINs ---
+
+def upgrade_pins(store, chunk_size=1000, workers=None):
+    """Hashes every plaintext PIN in ``store``; returns how many were changed."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    from bankcore.bulk import chunked
+
+    legacy = [record.acc_no for record in store if not is_hashed(record.pin)]
+    upgraded = 0
+    with ProcessPoolExecutor(workers) as pool:
+        for acc_nos in chunked(iter(legacy), chunk_size):
+            with store.transaction_many(acc_nos):
+                records = [store.get(acc_no) for acc_no in acc_nos]
+                records = [record.copy() for record in records
+                           if record is not None and not is_hashed(record.pin)]
+                hashes = pool.map(hash_pin, [record.pin for record in records], chunksize=64)
+                for record, hashed in zip(records, hashes):
+                    record.pin = hashed
+                store.put_many(records)
+            upgraded += len(records)
+    return upgraded
+
+
+def main(argv=None):
+    from bankcore.storage import open_store
+
+    parser = argparse.ArgumentParser(description="Manage stored PINs.")
+    parser.add_argument("--database", default="database.json")
+    parser.add_argument("--storage", help="snapshot, journal, sqlite, ledger or sharded (default: $BANK_STORAGE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade = commands.add_parser("upgrade", help="hash every plaintext PIN")
+    upgrade.add_argument("--workers", type=int, help="hashing processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.database, args.storage).load()
+    try:
+        count = upgrade_pins(store, workers=args.workers)
+    finally:
+        store.close()
+    print(f"Hashed {count} plaintext PINs.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+End-of-day interest and fees.
+
+    python -m bankcore.eod [--date 2026-10-17] [--database database.json]
+
+Every account earns a day's interest, ``balance * interest_bps / 10000 / 365``
+rounded down to a whole unit, and pays ``fee`` if its balance is under
+``minimum_balance`` (never going below zero). The defaults come from
+``BANK_EOD_INTEREST_BPS``, ``BANK_EOD_FEE`` and ``BANK_EOD_MINIMUM_BALANCE``.
+
+The arithmetic runs over a column of balances: one vectorized pass when
+NumPy is installed, otherwise chunks spread over a process pool. The new
+balances go back in one ``put_many`` (one snapshot or log write, one SQLite
+transaction). With BANK_STORAGE=ledger and NumPy the column is the mapped
+balance file itself, updated in place and synced once.
+
+Every account is locked while the run computes and applies, and the lock
+is released (with SQLite, the transaction committed) before the run is
+checkpointed as applied. Each step is saved in ``database.eod.json``:
+
+1. computed: the (account, old, new balance) of each account that changes
+   is in ``database.eod.bin``, fsynced;
+2. applied: the store has committed the new balances;
+3. done: the history has the "interest" and "fee" entries.
+
+Running again for a date that is done (or an earlier one) does nothing.
+After a crash the next run finishes the interrupted one first; applying
+only moves an account that still has its old balance, so nothing is
+credited twice. Resume before the front-ends are back: an account changed
+in between is skipped, and the count is reported.
+"""
+
+import argparse
+import datetime
+import itertools
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from bankcore import codec
+from bankcore.bulk import chunked
+from bankcore.history import history_for
+from bankcore.ledger import _key
+from bankcore.storage import LedgerStore, _write_atomic, open_store
+from bankcore.transactions import FEE, INTEREST
+
+DEFAULT_INTEREST_BPS = 350
+DEFAULT_FEE = 1
+DEFAULT_MINIMUM_BALANCE = 1000
+DEFAULT_CHUNK_SIZE = 100000
+# Annual basis points -> one day's share
+DAY_DIVISOR = 10000 * 365
+
+# One changing account in database.eod.bin: account number, old and new balance
+CHANGE = struct.Struct('<16sqq')
+CHANGE_DTYPE = [("key", "S16"), ("old", "<i8"), ("new", "<i8")]
+SLOT_DTYPE = [("key", "S16"), ("balance", "<i8")]
+
+COMPUTED, APPLIED, DONE = "computed", "applied", "done"
+
+
+# --- Arithmetic ---
+
+def interest_on(balance, interest_bps):
+    return balance * interest_bps // DAY_DIVISOR if balance > 0 else 0
+
+
+def end_of_day(balance, interest_bps, fee, minimum_balance):
+    """The balance after one day's interest and fee."""
+    interest = interest_on(balance, interest_bps)
+    charge = max(0, min(fee, balance + interest)) if balance < minimum_balance else 0
+    return balance + interest - charge
+
+
+def _end_of_day_chunk(balances, rates):
+    return [end_of_day(balance, *rates) for balance in balances]
+
+
+def interest_array(np, balances, interest_bps):
+    return np.where(balances > 0, balances * interest_bps // DAY_DIVISOR, 0)
+
+
+def end_of_day_array(np, balances, interest_bps, fee, minimum_balance):
+    """``end_of_day`` over a NumPy int64 array."""
+    interest = interest_array(np, balances, interest_bps)
+    charge = np.where(balances < minimum_balance, np.clip(balances + interest, 0, fee), 0)
+    return balances + interest - charge
+
+
+def default_rates():
+    """(interest_bps, fee, minimum_balance) from the environment."""
+    return (int(os.environ.get("BANK_EOD_INTEREST_BPS", DEFAULT_INTEREST_BPS)),
+            int(os.environ.get("BANK_EOD_FEE", DEFAULT_FEE)),
+            int(os.environ.get("BANK_EOD_MINIMUM_BALANCE", DEFAULT_MINIMUM_BALANCE)))
+
+
+def _numpy(engine):
+    if engine == "pool":
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if engine == "numpy":
+            raise
+        return None
+    return numpy
+
+
+# --- Checkpoint files ---
+
+def checkpoint_path(path):
+    return os.path.splitext(path)[0] + '.eod.json'
+
+
+def changes_path(path):
+    return os.path.splitext(path)[0] + '.eod.bin'
+
+
+def read_checkpoint(path):
+    try:
+        with open(checkpoint_path(path), 'rb') as fs:
+            return codec.loads(fs.read())
+    except FileNotFoundError:
+        return None
+
+
+def _save(path, checkpoint, stage):
+    checkpoint["stage"] = stage
+    _write_atomic(checkpoint_path(path), codec.dumps(checkpoint), kind="eod")
+
+
+def _read_changes(path):
+    with open(changes_path(path), 'rb') as fs:
+        data = fs.read()
+    for key, old, new in CHANGE.iter_unpack(data):
+        yield key.rstrip(b'\0').decode(), old, new
+
+
+def _totals(checkpoint, changes):
+    interest_bps = checkpoint["rates"][0]
+    interest = fees = 0
+    for _, old, new in changes:
+        earned = interest_on(old, interest_bps)
+        interest += earned
+        fees += old + earned - new
+    checkpoint.update(accounts=len(changes), interest=interest, fees=fees)
+
+
+# --- Steps ---
+
+def _compute(store, rates, np, workers, chunk_size):
+    """(acc_no, old, new) for every account whose balance changes."""
+    acc_nos = []
+    balances = []
+    for record in store:
+        acc_nos.append(record.acc_no)
+        balances.append(record.balance)
+    if np is not None:
+        old = np.array(balances, dtype=np.int64)
+        new = end_of_day_array(np, old, *rates)
+        changed = np.flatnonzero(new != old).tolist()
+        new = new.tolist()
+    else:
+        if (workers or os.cpu_count() or 1) > 1 and len(balances) > chunk_size:
+            with ProcessPoolExecutor(workers) as pool:
+                chunks = pool.map(partial(_end_of_day_chunk, rates=rates), chunked(balances, chunk_size))
+                new = list(itertools.chain.from_iterable(chunks))
+        else:
+            new = _end_of_day_chunk(balances, rates)
+        changed = [i for i, (before, after) in enumerate(zip(balances, new)) if before != after]
+    return [(acc_nos[i], balances[i], new[i]) for i in changed]
+
+
+def _apply(store, changes):
+    """
+    Moves accounts from their old to their new balance in one ``put_many``.
+    Returns the accounts that had neither balance (changed by someone else).
+    """
+    records = []
+    skipped = []
+    for acc_no, old, new in changes:
+        record = store.get(acc_no)
+        if record is not None and record.balance == old:
+            record = record.copy()
+            record.balance = new
+            records.append(record)
+        elif record is None or record.balance != new:
+            skipped.append(acc_no)
+    if records:
+        store.put_many(records)
+    return skipped
+
+
+def _run_ledger(store, path, checkpoint, np):
+    # Vectorized over the mapped ledger slots, written back in place
+    with store.ledger.slots_view() as view:
+        slots = np.frombuffer(view, dtype=SLOT_DTYPE)
+        old = slots["balance"].copy()
+        new = end_of_day_array(np, old, *checkpoint["rates"])
+        changed = np.flatnonzero((slots["key"] != b"") & (new != old))
+        changes = np.empty(len(changed), dtype=CHANGE_DTYPE)
+        changes["key"] = slots["key"][changed]
+        changes["old"] = old[changed]
+        changes["new"] = new[changed]
+        interest = interest_array(np, changes["old"], checkpoint["rates"][0])
+        checkpoint.update(accounts=len(changes), interest=int(interest.sum()),
+                          fees=int((changes["old"] + interest - changes["new"]).sum()))
+        _write_atomic(changes_path(path), changes.tobytes(), kind="eod")
+        _save(path, checkpoint, COMPUTED)
+        slots["balance"][changed] = changes["new"]
+        del slots, changes
+    return []
+
+
+def _record_history(store, path, checkpoint):
+    interest_bps = checkpoint["rates"][0]
+    skipped = set(checkpoint["skipped"])
+    entries = []
+    for acc_no, old, new in _read_changes(path):
+        if acc_no in skipped:
+            continue
+        interest = interest_on(old, interest_bps)
+        if interest:
+            entries.append((acc_no, INTEREST, interest, old + interest))
+        if old + interest != new:
+            entries.append((acc_no, FEE, old + interest - new, new))
+    history_for(store).record_many(entries, checkpoint["time"])
+
+
+def _finish(store, path, checkpoint, history):
+    """Takes an applied run to done."""
+    _save(path, checkpoint, APPLIED)
+    if history:
+        _record_history(store, path, checkpoint)
+    _save(path, checkpoint, DONE)
+    os.remove(changes_path(path))
+
+
+def run_end_of_day(store, date=None, rates=None, engine="auto", workers=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, history=True):
+    """
+    Applies interest and fees for ``date`` (ISO format, default today) and
+    returns the run's checkpoint: date, stage, rates, accounts changed,
+    interest, fees and skipped accounts. A run for a date that is already
+    done returns that run's checkpoint unchanged.
+    """
+    date = date or datetime.date.today().isoformat()
+    path = store.path
+    np = _numpy(engine)
+    while True:
+        with store.exclusive():
+            checkpoint = read_checkpoint(path)
+            if checkpoint is None or checkpoint["stage"] == DONE:
+                if checkpoint is not None and checkpoint["date"] >= date:
+                    return checkpoint
+                checkpoint = {"date": date, "rates": list(rates or default_rates()), "time": time.time()}
+                if np is not None and isinstance(store, LedgerStore):
+                    checkpoint["skipped"] = _run_ledger(store, path, checkpoint, np)
+                else:
+                    changes = _compute(store, checkpoint["rates"], np, workers, chunk_size)
+                    _totals(checkpoint, changes)
+                    _write_atomic(changes_path(path),
+                                  b"".join(CHANGE.pack(_key(acc_no), old, new) for acc_no, old, new in changes),
+                                  kind="eod")
+                    _save(path, checkpoint, COMPUTED)
+                    checkpoint["skipped"] = _apply(store, changes)
+                    del changes
+            elif checkpoint["stage"] == COMPUTED:
+                # Interrupted before its balances were committed, or right after
+                checkpoint["skipped"] = _apply(store, list(_read_changes(path)))
+        # The balances are committed now, so "applied" can't run ahead of them
+        with store.exclusive():
+            current = read_checkpoint(path)
+            if current["date"] != checkpoint["date"] or current["stage"] == DONE:
+                # Another run finished it in between
+                checkpoint = current
+            else:
+                _finish(store, path, checkpoint, history)
+        if checkpoint["date"] >= date:
+            return checkpoint
+
+
+def main(argv=None):
+    interest_bps, fee, minimum_balance = default_rates()
+    parser = argparse.ArgumentParser(description="Apply end-of-day interest and fees.")
+    parser.add_argument("--database", default="database.json")
+    parser.add_argument("--storage", help="snapshot, journal, sqlite, ledger or sharded (default: $BANK_STORAGE)")
+    parser.add_argument("--date", help="business date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--interest-bps", type=int, default=interest_bps, help="annual interest in basis points")
+    parser.add_argument("--fee", type=int, default=fee, help="daily fee below the minimum balance")
+    parser.add_argument("--minimum-balance", type=int, default=minimum_balance)
+    parser.add_argument("--engine", choices=("auto", "numpy", "pool"), default="auto")
+    parser.add_argument("--workers", type=int, help="pool processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--no-history", dest="history", action="store_false",
+                        help="don't add interest/fee entries to statements")
+    args = parser.parse_args(argv)
+    if args.date:
+        try:
+            datetime.date.fromisoformat(args.date)
+        except ValueError:
+            parser.error("--date must be YYYY-MM-DD")
+
+    store = open_store(args.database, args.storage).load()
+    try:
+        started = time.perf_counter()
+        result = run_end_of_day(store, args.date, (args.interest_bps, args.fee, args.minimum_balance),
+                                args.engine, args.workers, args.chunk_size, args.history)
+        elapsed = time.perf_counter() - started
+    finally:
+        store.close()
+    print(f"End of day {result['date']}: {result['accounts']} accounts changed, "
+          f"interest {result['interest']:,}, fees {result['fees']:,} ({elapsed:.2f}s)")
+    if result["skipped"]:
+        print(f"Skipped {len(result['skipped'])} accounts changed since the run was computed.")
+
+
+if __name__ == "__main__":
+    main()
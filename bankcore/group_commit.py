@@ -0,0 +1,83 @@
+"""
+Group commit for the write-ahead log.
+
+Each change must be fsync'd before its caller is told it succeeded, but an
+fsync costs the same for one record as for a hundred. ``GroupCommitter``
+lets concurrent writers share one: the first writer to arrive leads a batch,
+waits up to ``window`` seconds (and for any flush already in progress) while
+others add their records, then writes the whole batch and fsyncs once. Every
+writer in the batch returns only after that fsync, so the durability
+guarantee is the same as writing alone.
+
+A batch is closed to newcomers once it holds ``max_batch`` records. With a
+window of 0 nobody waits on purpose; batches still form from the writers that
+queue up behind a flush that is already running.
+"""
+
+import threading
+import time
+
+DEFAULT_WINDOW = 0.0
+DEFAULT_MAX_BATCH = 256
+
+
+class _Batch:
+    __slots__ = ("chunks", "count", "done", "error")
+
+    def __init__(self):
+        self.chunks = []
+        self.count = 0
+        self.done = False
+        self.error = None
+
+
+class GroupCommitter:
+    """Coalesces concurrent ``submit`` calls into single ``flush`` calls."""
+
+    def __init__(self, flush, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH):
+        # flush(data, count) writes and fsyncs; it runs in the leader's thread
+        self._flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._open = None
+
+    def submit(self, data, count=1):
+        """Queues ``data`` and returns once it is durable (or raises the flush error)."""
+        with self._cond:
+            batch = self._open
+            leader = batch is None or batch.count >= self.max_batch
+            if leader:
+                batch = self._open = _Batch()
+            batch.chunks.append(data)
+            batch.count += count
+            if not leader:
+                if batch.count >= self.max_batch:
+                    self._cond.notify_all()
+                while not batch.done:
+                    self._cond.wait()
+                if batch.error is not None:
+                    raise batch.error
+                return
+            deadline = time.monotonic() + self.window
+            while batch.count < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+        # Keep the batch open while an earlier batch is still being flushed
+        with self._flush_lock:
+            with self._cond:
+                if self._open is batch:
+                    self._open = None
+            try:
+                self._flush(b''.join(batch.chunks), batch.count)
+            except BaseException as err:
+                batch.error = err
+                raise
+            finally:
+                with self._cond:
+                    batch.done = True
+                    self._cond.notify_all()
@@ -0,0 +1,186 @@
+"""
+Transaction history: every credit and debit with its time and the balance it
+left behind.
+
+Entries go to an SQLite file next to the database (``database.history.db``
+for ``database.json``), whatever the storage mode, with an index on
+(account, time, id). A statement is read one page at a time by keyset
+pagination: the cursor is the (time, id) of the last row handed out, so
+page N costs the same as page 1 and nothing else of the account's history is
+read. ``iter_statement`` walks the pages lazily.
+
+Entries are written right after the balance change they describe, while the
+account is still locked, so an account's entries are in balance order. A
+sharded store (``bankcore.shards``) keeps one history file per shard.
+"""
+
+import os
+import threading
+import time
+import weakref
+
+PAGE_SIZE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id      INTEGER PRIMARY KEY,
+    acc_no  TEXT NOT NULL,
+    ts      REAL NOT NULL,
+    kind    TEXT NOT NULL,
+    amount  INTEGER NOT NULL,
+    balance INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_by_account ON transactions (acc_no, ts, id);
+"""
+
+INSERT = "INSERT INTO transactions (acc_no, ts, kind, amount, balance) VALUES (?, ?, ?, ?, ?)"
+# (ts, id) > cursor continues after the last row of the previous page
+SELECT_PAGE = """
+SELECT id, ts, kind, amount, balance FROM transactions
+WHERE acc_no = ? AND ts >= ? AND ts < ? AND (ts, id) > (?, ?)
+ORDER BY ts, id LIMIT ?
+"""
+SELECT_ALL = "SELECT acc_no, ts, kind, amount, balance FROM transactions ORDER BY id"
+
+
+def history_path(path):
+    """The history database that sits next to a database path."""
+    return os.path.splitext(path)[0] + '.history.db'
+
+
+def encode_cursor(ts, entry_id):
+    return f"{ts!r}:{entry_id}"
+
+
+def decode_cursor(cursor):
+    """(time, id) from a cursor; raises ValueError if it isn't one."""
+    ts, entry_id = cursor.split(":")
+    return float(ts), int(entry_id)
+
+
+class TransactionHistory:
+    """Append-only transaction entries, queried per account and time range."""
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        # One connection per thread, as in SQLiteStore
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Imported here so importing the service doesn't load sqlite3
+            import sqlite3
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, cached_statements=16)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def record(self, acc_no, kind, amount, balance, ts=None):
+        """Adds one entry (``balance`` is the balance after it)."""
+        self.record_many(((acc_no, kind, amount, balance),), ts)
+
+    def record_many(self, entries, ts=None):
+        """Adds (acc_no, kind, amount, balance) entries in one commit."""
+        ts = time.time() if ts is None else ts
+        self._insert([(acc_no, ts, kind, amount, balance) for acc_no, kind, amount, balance in entries])
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(INSERT, rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def statement(self, acc_no, start=None, end=None, cursor=None, limit=PAGE_SIZE):
+        """
+        One page of the account's entries with ``start <= time < end``
+        (Unix times; None is unbounded), oldest first.
+
+        Returns (entries, next_cursor); next_cursor is None on the last page.
+        """
+        after = decode_cursor(cursor) if cursor else (float("-inf"), 0)
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        rows = self._conn().execute(SELECT_PAGE, (acc_no, start, end) + after + (limit + 1,)).fetchall()
+        entries = [{"id": entry_id, "time": ts, "kind": kind, "amount": amount, "balance": balance}
+                   for entry_id, ts, kind, amount, balance in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(entries[-1]["time"], entries[-1]["id"])
+        return entries, next_cursor
+
+    def iter_statement(self, acc_no, start=None, end=None, page_size=PAGE_SIZE):
+        """Yields the account's entries in the range, fetching a page at a time."""
+        cursor = None
+        while True:
+            entries, cursor = self.statement(acc_no, start, end, cursor, page_size)
+            yield from entries
+            if cursor is None:
+                return
+
+    def entries(self):
+        """Every entry as an (acc_no, time, kind, amount, balance) row, oldest first."""
+        return self._conn().execute(SELECT_ALL)
+
+    def copy_entries(self, rows):
+        """Appends rows from ``entries`` (of another history) in one commit."""
+        self._insert(list(rows))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_histories = weakref.WeakKeyDictionary()
+_histories_lock = threading.Lock()
+
+
+class ShardedHistory:
+    """Routes each account's entries to the history of its shard's store."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _history(self, acc_no):
+        return history_for(self.store.shard(acc_no))
+
+    def record(self, acc_no, kind, amount, balance, ts=None):
+        self._history(acc_no).record(acc_no, kind, amount, balance, ts)
+
+    def record_many(self, entries, ts=None):
+        groups = {}
+        for entry in entries:
+            groups.setdefault(self.store.shard(entry[0]), []).append(entry)
+        for shard, group in groups.items():
+            history_for(shard).record_many(group, ts)
+
+    def statement(self, acc_no, start=None, end=None, cursor=None, limit=PAGE_SIZE):
+        return self._history(acc_no).statement(acc_no, start, end, cursor, limit)
+
+    def iter_statement(self, acc_no, start=None, end=None, page_size=PAGE_SIZE):
+        return self._history(acc_no).iter_statement(acc_no, start, end, page_size)
+
+
+def history_for(store):
+    """The transaction history kept alongside a store."""
+    with _histories_lock:
+        history = _histories.get(store)
+        if history is None:
+            if hasattr(store, "shard"):
+                history = ShardedHistory(store)
+            else:
+                history = TransactionHistory(history_path(store.path))
+            _histories[store] = history
+        return history
@@ -0,0 +1,132 @@
+"""In-memory hash index over accounts keyed by account number."""
+
+from bankcore.accounts import email_key, phone_key
+from bankcore.aggregates import Aggregates
+from bankcore.credentials import verify_pin
+
+
+class AccountIndex:
+    """
+    Maps "Account no." to its Account so lookups, credits and debits are
+    O(1) instead of a scan over the whole account list.
+
+    Accounts keep their insertion order, so iterating serializes back to
+    the same list layout database.json has always used. ``stats`` holds the
+    running totals (see bankcore.aggregates) over the indexed accounts.
+
+    Secondary hash indexes map each email (case-insensitively) and phone
+    number to the accounts using it, for duplicate checks and account
+    recovery. A key normally maps to one account number; databases from
+    before the uniqueness check may hold several, kept as a tuple.
+    """
+
+    def __init__(self, accounts=()):
+        self._by_acc = {}
+        for account in accounts:
+            # Last one wins if an old database holds a duplicate number
+            self._by_acc[account.acc_no] = account
+        self.stats = Aggregates()
+        self._by_email = {}
+        self._by_phone = {}
+        # acc_no -> (balance, email key, phone key) as last indexed: callers
+        # may change a stored account in place before putting it back
+        self._indexed = {}
+        for account in self._by_acc.values():
+            self._reindex(account)
+
+    def __len__(self):
+        return len(self._by_acc)
+
+    def __iter__(self):
+        return iter(self._by_acc.values())
+
+    def __contains__(self, acc_no):
+        return acc_no in self._by_acc
+
+    def get(self, acc_no):
+        """Returns the account for an account number, or None."""
+        return self._by_acc.get(acc_no)
+
+    def by_email(self, email):
+        """Account numbers registered with ``email`` (any case)."""
+        return _members(self._by_email.get(email_key(email)))
+
+    def by_phone(self, phone):
+        """Account numbers registered with ``phone``."""
+        return _members(self._by_phone.get(phone_key(phone)))
+
+    def find(self, acc_no, pin):
+        """Returns the account if it exists and the PIN matches."""
+        account = self._by_acc.get(acc_no)
+        if account is not None and verify_pin(account, pin):
+            return account
+        return None
+
+    def add(self, account):
+        """Indexes a new account."""
+        if account.acc_no in self._by_acc:
+            raise KeyError(f"Account {account.acc_no} already exists")
+        self._by_acc[account.acc_no] = account
+        self._reindex(account)
+
+    def put(self, account):
+        """Adds or replaces the account stored under its account number."""
+        self._by_acc[account.acc_no] = account
+        self._reindex(account)
+
+    def remove(self, acc_no):
+        """Drops an account from the index and returns it (or None)."""
+        account = self._by_acc.pop(acc_no, None)
+        if account is not None:
+            balance, email, phone = self._indexed.pop(acc_no)
+            self.stats.change(balance, None)
+            _unlink(self._by_email, email, acc_no)
+            _unlink(self._by_phone, phone, acc_no)
+        return account
+
+    def _reindex(self, account):
+        acc_no = account.acc_no
+        old = self._indexed.get(acc_no)
+        new = (account.balance, email_key(account.email), phone_key(account.phone))
+        self._indexed[acc_no] = new
+        self.stats.change(old[0] if old else None, new[0])
+        if old is None or old[1] != new[1]:
+            if old is not None:
+                _unlink(self._by_email, old[1], acc_no)
+            _link(self._by_email, new[1], acc_no)
+        if old is None or old[2] != new[2]:
+            if old is not None:
+                _unlink(self._by_phone, old[2], acc_no)
+            _link(self._by_phone, new[2], acc_no)
+
+    def records(self):
+        """Returns the accounts as a list, in the on-disk order."""
+        return list(self._by_acc.values())
+
+
+def _members(entry):
+    if entry is None:
+        return []
+    return list(entry) if isinstance(entry, tuple) else [entry]
+
+
+def _link(index, key, acc_no):
+    if key is None:
+        return
+    entry = index.get(key)
+    if entry is None:
+        index[key] = acc_no
+    elif entry != acc_no and not (isinstance(entry, tuple) and acc_no in entry):
+        index[key] = (entry if isinstance(entry, tuple) else (entry,)) + (acc_no,)
+
+
+def _unlink(index, key, acc_no):
+    entry = index.get(key)
+    if entry is None:
+        return
+    if not isinstance(entry, tuple):
+        if entry == acc_no:
+            del index[key]
+        return
+    rest = tuple(other for other in entry if other != acc_no)
+    index[key] = rest[0] if len(rest) == 1 else rest
@@ -0,0 +1,217 @@
+"""
+Fixed-width binary balance file, memory-mapped.
+
+Layout: a 16-byte header (magic, version, slot size, slots in use) followed
+by 24-byte slots, each an account number (NUL-padded to 16 bytes) and a
+signed 64-bit balance. A balance is read straight out of the mapping and
+updated in place with one 8-byte write and an msync of its page, so the cost
+of either does not depend on how many accounts the bank has.
+
+Slots are only ever appended. A deleted account's slot gets an all-zero
+account number and is never reused, so every process can keep its own
+account number -> slot index and simply check the slot's key on each access.
+Because the mapping is shared, a balance written by one process is visible
+to all others immediately; new slots are picked up by re-reading the header.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+from bankcore.locking import FileLock
+from bankcore.metrics import FILE_BYTES, WRITTEN_BYTES
+
+MAGIC = b'BLDG'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+SLOT = struct.Struct('<16sq')
+KEY_SIZE = 16
+INITIAL_SLOTS = 1024
+
+
+class BalanceLedger:
+    """Account balances in a memory-mapped file, addressed by account number."""
+
+    def __init__(self, path):
+        self.path = path
+        # Byte 0 of the ledger file serializes slot appends across processes
+        self._file_lock = FileLock(path)
+        self._io_lock = threading.RLock()
+        self._fd = None
+        self._map = None
+        self._slots = {}
+        self._scanned = 0
+
+    def open(self):
+        """Maps the file (creating it if needed) and indexes its slots."""
+        with self._io_lock, self._file_lock.hold(FileLock.APPEND):
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(self._fd).st_size < HEADER.size:
+                os.ftruncate(self._fd, HEADER.size + INITIAL_SLOTS * SLOT.size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, SLOT.size, 0), 0)
+                os.fsync(self._fd)
+            self._remap()
+            magic, version, slot_size, _ = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+                raise ValueError(f"{self.path} is not a balance ledger this version can read")
+            self._scan()
+        return self
+
+    def close(self):
+        with self._io_lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._file_lock.close()
+
+    # --- Reads ---
+
+    def __len__(self):
+        with self._io_lock:
+            self._scan()
+            return sum(1 for acc_no, slot in self._slots.items() if self._owns(slot, acc_no))
+
+    def __contains__(self, acc_no):
+        return self.balance(acc_no) is not None
+
+    def balance(self, acc_no):
+        """The account's balance, or None if the ledger has no slot for it."""
+        with self._io_lock:
+            slot = self._find(acc_no)
+            if slot is None:
+                return None
+            return SLOT.unpack_from(self._map, _offset(slot))[1]
+
+    # --- Writes ---
+
+    def set(self, acc_no, balance):
+        """Writes one balance in place (appending a slot for a new account)."""
+        self.set_many(((acc_no, balance),))
+
+    def set_many(self, items):
+        """Writes several balances and syncs the touched pages once."""
+        with self._io_lock:
+            new = {}
+            touched = []
+            for acc_no, balance in items:
+                if not isinstance(balance, int):
+                    raise TypeError(f"Ledger balances are whole numbers, got {balance!r}")
+                slot = self._find(acc_no)
+                if slot is None:
+                    new[acc_no] = balance
+                else:
+                    SLOT.pack_into(self._map, _offset(slot), _key(acc_no), balance)
+                    touched.append(slot)
+            if touched:
+                self._sync(min(touched), max(touched))
+                WRITTEN_BYTES.inc(SLOT.size * len(touched), "ledger")
+            if new:
+                self._append(list(new.items()))
+
+    @contextmanager
+    def slots_view(self):
+        """
+        Every slot in use as one writable buffer, for batch jobs over the whole
+        ledger; changes made through it are synced when the block exits. The
+        caller keeps other writers out, and must drop anything built on the
+        buffer before the ledger is closed.
+        """
+        with self._io_lock:
+            self._scan()
+            count = self._scanned
+            yield memoryview(self._map)[HEADER.size:_offset(count)]
+            if count:
+                self._sync(0, count - 1)
+                WRITTEN_BYTES.inc(SLOT.size * count, "ledger")
+
+    def remove(self, acc_no):
+        """Frees the account's slot; returns False if it had none."""
+        with self._io_lock:
+            slot = self._find(acc_no)
+            if slot is None:
+                return False
+            SLOT.pack_into(self._map, _offset(slot), b'', 0)
+            del self._slots[acc_no]
+            self._sync(slot, slot)
+            return True
+
+    # --- Slots ---
+
+    def _find(self, acc_no):
+        slot = self._slots.get(acc_no)
+        if slot is not None and self._owns(slot, acc_no):
+            return slot
+        # Unknown here, or freed by another process: look at slots added since
+        self._slots.pop(acc_no, None)
+        self._scan()
+        slot = self._slots.get(acc_no)
+        if slot is not None and self._owns(slot, acc_no):
+            return slot
+        return None
+
+    def _owns(self, slot, acc_no):
+        offset = _offset(slot)
+        return self._map[offset:offset + KEY_SIZE].rstrip(b'\0') == acc_no.encode()
+
+    def _scan(self):
+        """Indexes slots appended (by anyone) since we last looked."""
+        count = HEADER.unpack_from(self._map, 0)[3]
+        if count == self._scanned:
+            return
+        if _offset(count) > len(self._map):
+            self._remap()
+        for slot in range(self._scanned, count):
+            key = self._map[_offset(slot):_offset(slot) + KEY_SIZE].rstrip(b'\0')
+            if key:
+                self._slots[key.decode()] = slot
+        self._scanned = count
+
+    def _append(self, items):
+        with self._file_lock.hold(FileLock.APPEND):
+            self._scan()
+            count = self._scanned
+            needed = _offset(count + len(items))
+            if needed > len(self._map):
+                size = len(self._map)
+                while size < needed:
+                    size = HEADER.size + 2 * (size - HEADER.size)
+                os.ftruncate(self._fd, size)
+                self._remap()
+            for i, (acc_no, balance) in enumerate(items):
+                SLOT.pack_into(self._map, _offset(count + i), _key(acc_no), balance)
+                self._slots[acc_no] = count + i
+            # Slots first, then the count that makes them visible
+            self._sync(count, count + len(items) - 1)
+            WRITTEN_BYTES.inc(SLOT.size * len(items), "ledger")
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, SLOT.size, count + len(items))
+            self._map.flush(0, mmap.PAGESIZE)
+            self._scanned = count + len(items)
+
+    def _remap(self):
+        size = os.fstat(self._fd).st_size
+        if self._map is not None:
+            if len(self._map) == size:
+                return
+            self._map.close()
+        self._map = mmap.mmap(self._fd, size)
+        FILE_BYTES.set(size, "ledger")
+
+    def _sync(self, first_slot, last_slot):
+        start = _offset(first_slot) // mmap.PAGESIZE * mmap.PAGESIZE
+        self._map.flush(start, _offset(last_slot + 1) - start)
+
+
+def _offset(slot):
+    return HEADER.size + slot * SLOT.size
+
+
+def _key(acc_no):
+    key = acc_no.encode()
+    if len(key) > KEY_SIZE:
+        raise ValueError(f"Account number too long for the ledger: {acc_no}")
+    return key
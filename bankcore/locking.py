@@ -0,0 +1,109 @@
+"""
+Locks for concurrent read-modify-write cycles on the account store.
+
+``StripedLock`` hashes an account number onto one of N thread locks, so
+sessions touching different accounts rarely wait on each other. ``FileLock``
+mirrors the same stripes across processes with POSIX byte-range locks on a
+shared lock file: stripe ``i`` is byte ``i + 1`` and byte 0 guards appends to
+the write-ahead log. Locking the whole file excludes every stripe at once.
+"""
+
+import errno
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+DEFAULT_STRIPES = 64
+
+
+def stripe_of(acc_no, stripes=DEFAULT_STRIPES):
+    """Stable stripe number for an account (the same in every process)."""
+    return zlib.crc32(acc_no.encode()) % stripes
+
+
+class StripedLock:
+    """A fixed set of thread locks addressed by account number."""
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def index(self, acc_no):
+        return stripe_of(acc_no, self.stripes)
+
+    @contextmanager
+    def hold(self, stripe):
+        with self._locks[stripe]:
+            yield
+
+    @contextmanager
+    def hold_all(self):
+        """Takes every stripe, always in the same order to avoid deadlock."""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+
+class FileLock:
+    """
+    Cross-process counterpart of ``StripedLock``.
+
+    POSIX record locks belong to the process, not the thread, so callers must
+    already hold the matching in-process lock. The descriptor stays open for
+    the lifetime of the object: closing any descriptor on the file would drop
+    every lock this process holds on it.
+    """
+
+    APPEND = -1
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def _fileno(self):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    @contextmanager
+    def hold(self, stripe=None):
+        """Locks one stripe, the log-append byte (APPEND), or everything (None)."""
+        if fcntl is None:
+            yield
+            return
+        fd = self._fileno()
+        if stripe is None:
+            start, length = 0, 0  # length 0 means "to the end of the file and beyond"
+        else:
+            start, length = stripe + 1, 1
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX, length, start)
+                break
+            except OSError as err:
+                if err.errno != errno.EDEADLK:
+                    raise
+                # The kernel tracks record locks per process, so two threads
+                # of different processes waiting on each other's stripes can
+                # look like a cycle. They aren't; back off and try again.
+                time.sleep(0.001)
+        try:
+            yield
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, length, start)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,267 @@
+"""
+In-process metrics and profiling.
+
+Counters, gauges and latency histograms live in one registry and render in
+the Prometheus text format: ``api_server.py`` serves it at ``GET /metrics``,
+and ``BANK_METRICS_FILE=path`` dumps it when the process exits (handy for
+``main.py shell`` and batch jobs). What is recorded:
+
+* ``bank_operation_seconds{op}`` - every ``bankcore.service`` operation, with
+  ``bank_operation_failures_total{op,reason}`` for refused/errored ones;
+* ``bank_storage_seconds{store,call}`` - load, refresh, get, put, delete,
+  compact... on every storage backend, failures counted alongside;
+* ``bank_storage_read_bytes_total`` / ``bank_storage_written_bytes_total``
+  and ``bank_storage_file_bytes`` per file kind (snapshot, log, ledger).
+
+``BANK_PROFILE=cpu`` runs cProfile and ``BANK_PROFILE=memory`` runs
+tracemalloc for the life of the process, writing to ``BANK_PROFILE_OUT``
+(default ``bank-profile.prof`` / ``bank-profile.txt``) at exit; the same
+capture can be started and stopped around any block with ``profile()``.
+cProfile only sees the thread that started it; tracemalloc sees them all.
+"""
+
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _label_text(self, values, extra=None):
+        pairs = list(zip(self.labels, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return "{" + body + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            lines.extend(self._render_one(values, value))
+        return lines
+
+    def _render_one(self, values, value):
+        return [f"{self.name}{self._label_text(values)} {_number(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, *values):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def value(self, *values):
+        return self._values.get(values, 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *values):
+        with self._lock:
+            self._values[values] = value
+
+    def value(self, *values):
+        return self._values.get(values)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(values)
+            if state is None:
+                # per-bucket counts (the last is +Inf), sum, count
+                state = self._values[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *values)
+
+    def count(self, *values):
+        state = self._values.get(values)
+        return state[2] if state else 0
+
+    def _render_one(self, values, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(values, ('le', le))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --- The bank's metrics ---
+
+REGISTRY = Registry()
+
+OPERATION_SECONDS = REGISTRY.add(Histogram(
+    "bank_operation_seconds", "Latency of banking operations.", ("op",)))
+OPERATION_FAILURES = REGISTRY.add(Counter(
+    "bank_operation_failures_total", "Operations refused (bad input, auth) or failed.", ("op", "reason")))
+STORAGE_SECONDS = REGISTRY.add(Histogram(
+    "bank_storage_seconds", "Latency of storage backend calls.", ("store", "call")))
+STORAGE_FAILURES = REGISTRY.add(Counter(
+    "bank_storage_failures_total", "Storage backend calls that raised.", ("store", "call")))
+READ_BYTES = REGISTRY.add(Counter(
+    "bank_storage_read_bytes_total", "Bytes read from the database files.", ("file",)))
+WRITTEN_BYTES = REGISTRY.add(Counter(
+    "bank_storage_written_bytes_total", "Bytes written to the database files.", ("file",)))
+FILE_BYTES = REGISTRY.add(Gauge(
+    "bank_storage_file_bytes", "Current size of the database files.", ("file",)))
+
+
+def timed_operation(op):
+    """Decorator recording a service operation's latency and failures."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as err:
+                # BankError (from bankcore.service) carries an HTTP-style status
+                OPERATION_FAILURES.inc(1, op, "refused" if hasattr(err, "status") else "error")
+                raise
+            finally:
+                OPERATION_SECONDS.observe(time.perf_counter() - start, op)
+        return wrapper
+    return decorate
+
+
+def timed_call(func):
+    """Decorator for storage backend methods, labelled by backend class and method."""
+    call = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        except Exception:
+            STORAGE_FAILURES.inc(1, type(self).__name__, call)
+            raise
+        finally:
+            STORAGE_SECONDS.observe(time.perf_counter() - start, type(self).__name__, call)
+    return wrapper
+
+
+def dump(path):
+    """Writes the current metrics to ``path`` (replacing it atomically)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as fs:
+        fs.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+# --- Profiling ---
+
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profile(kind="cpu", path=None):
+    """
+    Captures a cProfile (``kind="cpu"``, binary stats for pstats/snakeviz)
+    or tracemalloc (``kind="memory"``, top allocation sites as text) profile
+    of the block and writes it to ``path``.
+    """
+    if kind not in ("cpu", "memory"):
+        raise ValueError(f"Unknown profile kind: {kind}")
+    path = path or ("bank-profile.prof" if kind == "cpu" else "bank-profile.txt")
+    with _profile_lock:
+        if kind == "cpu":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            import tracemalloc
+            tracemalloc.start()
+    try:
+        yield path
+    finally:
+        with _profile_lock:
+            if kind == "cpu":
+                profiler.disable()
+                profiler.dump_stats(path)
+            else:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                with open(path, 'w') as fs:
+                    for stat in snapshot.statistics("lineno")[:50]:
+                        fs.write(f"{stat}\n")
+
+
+def _start_from_environment():
+    metrics_file = os.environ.get("BANK_METRICS_FILE")
+    if metrics_file:
+        atexit.register(dump, metrics_file)
+    kind = os.environ.get("BANK_PROFILE")
+    if kind:
+        capture = profile(kind, os.environ.get("BANK_PROFILE_OUT"))
+        capture.__enter__()
+        atexit.register(capture.__exit__, None, None, None)
+
+
+_start_from_environment()
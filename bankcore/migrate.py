@@ -0,0 +1,44 @@
+"""
+Imports a JSON account database into the SQLite backend.
+
+    python -m bankcore.migrate                      # database.json -> database.db
+    python -m bankcore.migrate old.json --target new.db
+
+The source is read through the normal JSON store, so a pending write-ahead
+log (journal mode) is replayed before the import. Existing rows with the
+same account number are overwritten, which makes re-running it safe.
+"""
+
+import argparse
+
+from bankcore.sqlite_store import SQLiteStore
+from bankcore.storage import JournalStore, sqlite_path
+
+
+def migrate(source, target=None, chunk_size=10000):
+    """Copies every account from ``source`` into ``target``; returns the count."""
+    target = target or sqlite_path(source)
+    json_store = JournalStore(source)
+    sqlite_store = SQLiteStore(target)
+    try:
+        json_store.load()
+        sqlite_store.load()
+        return sqlite_store.import_records(json_store, chunk_size=chunk_size)
+    finally:
+        json_store.close()
+        sqlite_store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import database.json into SQLite.")
+    parser.add_argument("source", nargs="?", default="database.json")
+    parser.add_argument("--target", help="SQLite file (default: source with a .db suffix)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    count = migrate(args.source, args.target, args.chunk_size)
+    print(f"Imported {count} accounts into {args.target or sqlite_path(args.source)}")
+
+
+if __name__ == "__main__":
+    main()
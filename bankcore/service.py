@@ -0,0 +1,176 @@
+"""
+The banking operations as plain functions over a store.
+
+Each function authenticates, validates and persists one operation and
+either returns the resulting Account or raises a ``BankError`` whose
+message is fit to show to the user. Front-ends that can't show a form
+(the HTTP API, scripts) call these instead of re-implementing the rules.
+"""
+
+from bankcore.account_numbers import allocator_for
+from bankcore.accounts import check_new_account, check_unique, contact_locks, new_account_record
+from bankcore.credentials import hash_pin, is_hashed, locked_out
+from bankcore.history import PAGE_SIZE, history_for
+from bankcore.metrics import timed_operation
+from bankcore.transactions import DEPOSIT, WITHDRAW, check_amount
+
+
+class BankError(Exception):
+    """An operation was refused; ``str(err)`` is the user-facing reason."""
+
+    status = 400
+
+
+class AuthError(BankError):
+    """Unknown account number or wrong PIN."""
+
+    status = 401
+
+
+class DuplicateError(BankError):
+    """The email or phone number already belongs to another account."""
+
+    status = 409
+
+
+class LockedOut(AuthError):
+    """Too many wrong PINs for the account in a row."""
+
+    status = 429
+
+
+def _authenticated(store, acc_no, pin):
+    if locked_out(acc_no):
+        raise LockedOut("Too many failed PIN attempts. Try again later.")
+    user = store.find(acc_no, pin)
+    if user is None:
+        raise AuthError("User not found or incorrect PIN.")
+    return user
+
+
+def _changeable(user, pin):
+    """A copy of ``user`` to modify, with a plaintext PIN upgraded to a hash."""
+    changed = user.copy()
+    if not is_hashed(changed.pin):
+        changed.pin = hash_pin(pin)
+    return changed
+
+
+def _parse_amount(amount):
+    try:
+        return int(amount)
+    except (TypeError, ValueError):
+        raise BankError("Amount must be numeric.") from None
+
+
+@timed_operation("create_account")
+def create_account(store, name, email, phone, pin):
+    error = check_new_account(name, email, phone, pin)
+    if error:
+        raise BankError(error)
+    with allocator_for(store).reserve() as (acc_no,):
+        account = new_account_record(name, email, str(phone).strip(), str(pin).strip(), acc_no)
+        # Locks the email and phone too, so a signup with either elsewhere waits
+        with store.transaction_many([acc_no] + contact_locks(email, phone)):
+            error = check_unique(store, email, phone)
+            if error:
+                raise DuplicateError(error)
+            store.put(account)
+    return account
+
+
+def _move_money(store, kind, acc_no, pin, amount):
+    amount = _parse_amount(amount)
+    with store.transaction(acc_no):
+        user = _authenticated(store, acc_no, pin)
+        error = check_amount(kind, amount, user.balance)
+        if error:
+            raise BankError(error)
+        # Change a copy so memory still matches disk if the write fails
+        changed = _changeable(user, pin)
+        changed.balance += amount if kind == DEPOSIT else -amount
+        store.put(changed)
+        history_for(store).record(acc_no, kind, amount, changed.balance)
+    return changed
+
+
+@timed_operation("deposit")
+def deposit(store, acc_no, pin, amount):
+    return _move_money(store, DEPOSIT, acc_no, pin, amount)
+
+
+@timed_operation("withdraw")
+def withdraw(store, acc_no, pin, amount):
+    return _move_money(store, WITHDRAW, acc_no, pin, amount)
+
+
+@timed_operation("details")
+def details(store, acc_no, pin):
+    return _authenticated(store, acc_no, pin)
+
+
+@timed_operation("statement")
+def get_statement(store, acc_no, pin, start=None, end=None, cursor=None, limit=PAGE_SIZE):
+    """
+    One page of the account's transactions between ``start`` and ``end``
+    (Unix times), oldest first: returns (entries, next_cursor).
+    """
+    _authenticated(store, acc_no, pin)
+    if not 1 <= limit <= 1000:
+        raise BankError("Page size must be between 1 and 1000.")
+    try:
+        return history_for(store).statement(acc_no, start, end, cursor, limit)
+    except ValueError:
+        raise BankError("Invalid statement cursor.") from None
+
+
+@timed_operation("update_details")
+def update_details(store, acc_no, pin, name=None, email=None, phone=None, new_pin=None):
+    """Changes the given profile fields; None or "" leaves a field as it is."""
+    with store.transaction_many([acc_no] + contact_locks(email, phone)):
+        user = _authenticated(store, acc_no, pin)
+        changed = _changeable(user, pin)
+        if name:
+            changed.name = name
+        if email:
+            changed.email = email
+        if phone:
+            phone = str(phone).strip()
+            if len(phone) != 10 or not phone.isnumeric():
+                raise BankError("Phone number must be exactly 10 digits.")
+            changed.phone = int(phone)
+        if new_pin:
+            new_pin = str(new_pin).strip()
+            if len(new_pin) != 4 or not new_pin.isnumeric():
+                raise BankError("PIN must be exactly 4 digits.")
+            changed.pin = hash_pin(new_pin)
+        error = check_unique(store, email, phone, acc_no)
+        if error:
+            raise DuplicateError(error)
+        store.put(changed)
+    return changed
+
+
+@timed_operation("recover_account")
+def recover_account(store, contact, pin):
+    """
+    Finds a forgotten account number from the account's email or phone
+    number and its PIN. Wrong PINs count towards the account's lockout.
+    """
+    contact = str(contact or "").strip()
+    acc_nos = store.accounts_by_phone(contact) if contact.isdigit() else store.accounts_by_email(contact)
+    for acc_no in acc_nos:
+        if locked_out(acc_no):
+            raise LockedOut("Too many failed PIN attempts. Try again later.")
+        user = store.find(acc_no, pin)
+        if user is not None:
+            return user
+    raise AuthError("No account matches that email/phone and PIN.")
+
+
+@timed_operation("delete_account")
+def delete_account(store, acc_no, pin):
+    with store.transaction(acc_no):
+        user = _authenticated(store, acc_no, pin)
+        store.delete(acc_no)
+    return user
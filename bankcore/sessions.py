@@ -0,0 +1,85 @@
+"""
+Login sessions for front-ends that serve many requests per login (Streamlit).
+
+Call ``open`` once the PIN has been verified; it returns a random token.
+``account(store, token)`` turns the token back into the account with one
+index lookup and a string compare, no PIN hashing. The session keeps the
+account number, not the account object: the stores replace an account's
+object on every change, so it is looked up again on each use.
+
+A session ends after ``ttl`` seconds without use, on ``close``, or as soon
+as the account's PIN changes or the account is deleted. At most
+``max_sessions`` are kept; the least recently used goes first. Sessions live
+in this process only (``BANK_SESSION_TTL``, ``BANK_SESSION_MAX``).
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 900.0
+DEFAULT_MAX_SESSIONS = 10000
+
+
+class SessionCache:
+    """Session tokens -> account numbers, evicted by idle time and LRU."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # token -> [acc_no, stored pin, expiry], least recently used first
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def open(self, account):
+        """Starts a session for an account whose PIN was just checked."""
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            self._sessions[token] = [account.acc_no, account.pin, now + self.ttl]
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return token
+
+    def account(self, store, token):
+        """The session's account from ``store``, or None if the session is over."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                del self._sessions[token]
+                return None
+            entry[2] = now + self.ttl
+            self._sessions.move_to_end(token)
+            acc_no, pin = entry[0], entry[1]
+        record = store.get(acc_no)
+        if record is None or record.pin != pin:
+            self.close(token)
+            return None
+        return record
+
+    def close(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def _evict(self, now):
+        # Use order is expiry order, so the expired ones are all at the front
+        while self._sessions:
+            token, entry = next(iter(self._sessions.items()))
+            if entry[2] > now:
+                break
+            del self._sessions[token]
+
+
+sessions = SessionCache(
+    ttl=float(os.environ.get("BANK_SESSION_TTL", DEFAULT_TTL)),
+    max_sessions=int(os.environ.get("BANK_SESSION_MAX", DEFAULT_MAX_SESSIONS)),
+)
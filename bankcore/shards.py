@@ -0,0 +1,566 @@
+"""
+Sharded account storage.
+
+``ShardedStore`` splits the accounts over N JSON stores, picking the shard
+from a hash of the account number. Every shard has its own snapshot, log,
+lock file, saved totals and transaction history (``database.s4-0.json``,
+``database.s4-0.wal``, ``database.s4-0.history.db``, ...), so writers to
+different shards never wait on the same lock or fsync.
+``database.shards.json`` records the layout; the first load writes it from
+``BANK_SHARDS`` (default 4) and ``BANK_SHARD_MODE`` (journal or snapshot).
+Select it with ``BANK_STORAGE=sharded``.
+
+``ShardPool`` goes one step further for batch and server workloads: each
+worker process owns a share of the shards and runs the service operations
+for them, so the work is spread over CPU cores as well as files. Calls are
+routed to the process that owns the account's shard.
+
+Changing N moves accounts between shards, which is an offline job (stop
+every writer first):
+
+    python -m bankcore.shards rebalance --shards 8 [--database database.json]
+    python -m bankcore.shards status
+
+Rebalancing a database that isn't sharded yet splits it, reading it in
+``--from-storage`` mode (default: ``BANK_STORAGE``, or journal when that is
+sharded). The original database is left where it was, and its history is
+copied into the shards.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import pickle
+import threading
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
+
+from bankcore import service
+from bankcore.accounts import CONTACT_LOCK_PREFIXES, email_key, phone_key
+from bankcore.aggregates import FIELDS, FLOWS
+from bankcore.backend import StorageBackend
+from bankcore.bulk import chunked
+from bankcore.history import TransactionHistory, history_path
+from bankcore.locking import stripe_of
+from bankcore.storage import STORE_MODES, JournalStore, SnapshotStore, _write_atomic, open_store
+
+DEFAULT_SHARDS = 4
+DEFAULT_SHARD_MODE = "journal"
+SHARD_MODES = {"journal": JournalStore, "snapshot": SnapshotStore}
+
+
+def shard_of(acc_no, shards):
+    """The shard an account number lives in (the same in every process)."""
+    return stripe_of(acc_no, shards)
+
+
+def manifest_path(path):
+    return os.path.splitext(path)[0] + '.shards.json'
+
+
+def shard_path(path, shards, index):
+    """Shard files carry the shard count, so two layouts never share a file."""
+    base, ext = os.path.splitext(path)
+    return f"{base}.s{shards}-{index}{ext or '.json'}"
+
+
+def read_manifest(path):
+    """The recorded layout ({"shards", "mode"}), or None if there is none."""
+    try:
+        with open(manifest_path(path)) as fs:
+            return json.load(fs)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(path, shards, mode):
+    _write_atomic(manifest_path(path), json.dumps({"shards": shards, "mode": mode}).encode(), "manifest")
+
+
+class ShardedStore(StorageBackend):
+    """
+    N JSON stores behind one ``StorageBackend``, routed by account number.
+
+    ``owned`` limits the store to some of the shards (a ``ShardPool``
+    worker); touching an account of another shard then raises ValueError.
+    Batches spanning shards lock them in shard order and are durable per
+    shard, not as a whole.
+    """
+
+    def __init__(self, path, shards=None, mode=None, owned=None):
+        self.path = path
+        manifest = read_manifest(path)
+        if manifest is not None:
+            if shards and shards != manifest["shards"]:
+                raise ValueError(f"{path} has {manifest['shards']} shards, not {shards}; "
+                                 f"use 'python -m bankcore.shards rebalance' to change that")
+            shards, mode = manifest["shards"], manifest["mode"]
+        self.shards = shards or int(os.environ.get("BANK_SHARDS", DEFAULT_SHARDS))
+        self.mode = mode or os.environ.get("BANK_SHARD_MODE", DEFAULT_SHARD_MODE)
+        if self.mode not in SHARD_MODES:
+            raise ValueError(f"Shards can use {', '.join(SHARD_MODES)}, not {self.mode}")
+        self._has_manifest = manifest is not None
+        self.owned = tuple(range(self.shards)) if owned is None else tuple(sorted(owned))
+        self._stores = {i: SHARD_MODES[self.mode](shard_path(path, self.shards, i)) for i in self.owned}
+
+    def load(self):
+        if not self._has_manifest:
+            write_manifest(self.path, self.shards, self.mode)
+            self._has_manifest = True
+        for store in self._stores.values():
+            store.load()
+        return self
+
+    def is_stale(self):
+        return any(store.is_stale() for store in self._stores.values())
+
+    def refresh(self):
+        for store in self._stores.values():
+            store.refresh()
+
+    def owns(self, acc_no):
+        return shard_of(acc_no, self.shards) in self._stores
+
+    def shard(self, acc_no):
+        """The store holding ``acc_no``'s shard."""
+        index = shard_of(acc_no, self.shards)
+        store = self._stores.get(index)
+        if store is None:
+            raise ValueError(f"Account {acc_no} is in shard {index}, which this store doesn't own")
+        return store
+
+    def sizes(self):
+        """Accounts per owned shard."""
+        return {index: len(store) for index, store in self._stores.items()}
+
+    def _by_shard(self, items, key):
+        groups = {}
+        for item in items:
+            groups.setdefault(shard_of(key(item), self.shards), []).append(item)
+        return sorted(groups.items())
+
+    # --- Reads ---
+
+    def __len__(self):
+        return sum(len(store) for store in self._stores.values())
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._stores.values())
+
+    def __contains__(self, acc_no):
+        return acc_no in self.shard(acc_no)
+
+    def get(self, acc_no):
+        return self.shard(acc_no).get(acc_no)
+
+    def find(self, acc_no, pin):
+        return self.shard(acc_no).find(acc_no, pin)
+
+    def accounts_by_email(self, email):
+        return [acc_no for store in self._stores.values() for acc_no in store.accounts_by_email(email)]
+
+    def accounts_by_phone(self, phone):
+        return [acc_no for store in self._stores.values() for acc_no in store.accounts_by_phone(phone)]
+
+    def stats(self):
+        totals = dict.fromkeys(FIELDS, 0)
+        for store in self._stores.values():
+            for key, value in store.stats().items():
+                totals[key] += value
+        return totals
+
+    # --- Writes ---
+
+    def transaction(self, acc_no):
+        return self.shard(acc_no).transaction(acc_no)
+
+    @contextmanager
+    def transaction_many(self, acc_nos):
+        """
+        Locks the accounts in their shards. Email and phone keys (see
+        ``contact_locks``) lock a stripe of the shard they hash to, and then
+        every shard is refreshed, so ``check_unique`` sees accounts other
+        processes saved anywhere. A pool worker skips the keys of shards it
+        doesn't own; the pool checks those itself.
+        """
+        contacts = {key for key in acc_nos if str(key).startswith(CONTACT_LOCK_PREFIXES)}
+        keys = [key for key in acc_nos if key not in contacts or self.owns(key)]
+        with ExitStack() as stack:
+            # Always in shard order, so two batches can't deadlock
+            for index, group in self._by_shard(keys, str):
+                stack.enter_context(self.shard(group[0]).transaction_many(group))
+            if contacts:
+                self.refresh()
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        """Locks every owned shard whole, in shard order."""
+        with ExitStack() as stack:
+            for index in self.owned:
+                stack.enter_context(self._stores[index].exclusive())
+            yield
+
+    def put(self, record):
+        self.shard(record["Account no."]).put(record)
+
+    def put_many(self, records):
+        for index, group in self._by_shard(records, lambda record: record["Account no."]):
+            self.shard(group[0]["Account no."]).put_many(group)
+
+    def delete(self, acc_no):
+        return self.shard(acc_no).delete(acc_no)
+
+    def close(self):
+        for store in self._stores.values():
+            store.close()
+
+
+# --- Worker pool ---
+
+# What a ShardPool can run; all but create_account and recover_account take
+# the account number first
+POOL_OPERATIONS = {
+    "create_account": service.create_account,
+    "recover_account": service.recover_account,
+    "deposit": service.deposit,
+    "withdraw": service.withdraw,
+    "details": service.details,
+    "update_details": service.update_details,
+    "delete_account": service.delete_account,
+    "get_statement": service.get_statement,
+}
+
+
+def _contacts(store):
+    return [(record.acc_no, record.email, record.phone) for record in store]
+
+
+def _worker(path, owned, requests, results):
+    operations = dict(POOL_OPERATIONS, contacts=_contacts)
+    store = ShardedStore(path, owned=owned).load()
+    try:
+        while True:
+            item = requests.get()
+            if item is None:
+                break
+            call_id, op, args = item
+            try:
+                results.put((call_id, True, operations[op](store, *args)))
+            except Exception as err:
+                try:
+                    pickle.dumps(err)
+                except Exception:
+                    err = RuntimeError(repr(err))
+                results.put((call_id, False, err))
+    finally:
+        store.close()
+
+
+class ContactClaims:
+    """
+    Which accounts hold each email and phone number, across every shard.
+
+    A pool worker only sees its own shards, so the pool checks uniqueness
+    here before dispatching. A create or update in flight claims its keys
+    under a token, so two concurrent calls can't both take the same email.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # ("email" | "phone", key) -> holders (account numbers or claim tokens)
+        self._holders = {}
+        # holder -> its keys
+        self._keys = {}
+
+    @staticmethod
+    def keys(email, phone):
+        keys = (("email", email_key(email)), ("phone", phone_key(phone)))
+        return [key for key in keys if key[1] is not None]
+
+    def add(self, holder, email, phone):
+        with self._lock:
+            self._add(holder, self.keys(email, phone))
+
+    def _add(self, holder, keys):
+        for key in keys:
+            self._holders.setdefault(key, set()).add(holder)
+        self._keys.setdefault(holder, []).extend(keys)
+
+    def remove(self, holder):
+        with self._lock:
+            for key in self._keys.pop(holder, ()):
+                holders = self._holders[key]
+                holders.discard(holder)
+                if not holders:
+                    del self._holders[key]
+
+    def claim(self, token, email, phone, acc_no=None):
+        """
+        Claims the keys for ``token``; returns check_unique's error if
+        another holder has one.
+        """
+        keys = self.keys(email, phone)
+        with self._lock:
+            for kind, key in keys:
+                if self._holders.get((kind, key), set()) - {acc_no}:
+                    what = "email" if kind == "email" else "phone number"
+                    return f"An account with this {what} already exists."
+            self._add(token, keys)
+        return None
+
+    def holders(self, contact):
+        """Account numbers using ``contact`` (an email or phone number)."""
+        contact = str(contact or "").strip()
+        key = ("phone", phone_key(contact)) if contact.isdigit() else ("email", email_key(contact))
+        with self._lock:
+            return [holder for holder in self._holders.get(key, ()) if isinstance(holder, str)]
+
+
+class ShardPool:
+    """
+    Worker processes that each own ``shards / workers`` of the shards.
+
+    ``submit(op, *args)`` runs a service operation (see ``POOL_OPERATIONS``)
+    in the process owning the account's shard and returns a Future; new
+    accounts go to the workers in turn. The layout must exist before the
+    pool starts (load a ``ShardedStore`` once), and while it runs the pool
+    must be the only writer: emails and phone numbers are checked for
+    duplicates in ``ContactClaims``, which only sees the pool's own changes.
+    """
+
+    def __init__(self, path, workers=None):
+        import multiprocessing
+
+        manifest = read_manifest(path)
+        if manifest is None:
+            raise ValueError(f"{path} isn't sharded yet; load a ShardedStore or rebalance first")
+        self.shards = manifest["shards"]
+        workers = max(1, min(workers or os.cpu_count() or 1, self.shards))
+        self._owner = [index % workers for index in range(self.shards)]
+        self._next_worker = itertools.cycle(range(workers))
+        self._requests = [multiprocessing.Queue() for _ in range(workers)]
+        self._results = multiprocessing.Queue()
+        self._processes = []
+        for worker in range(workers):
+            owned = [index for index in range(self.shards) if self._owner[index] == worker]
+            process = multiprocessing.Process(target=_worker, daemon=True,
+                                              args=(path, owned, self._requests[worker], self._results))
+            process.start()
+            self._processes.append(process)
+        self._ids = itertools.count()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        self.contacts = ContactClaims()
+        loading = [self._send(worker, "contacts", ()) for worker in range(workers)]
+        for future in loading:
+            for acc_no, email, phone in future.result():
+                self.contacts.add(acc_no, email, phone)
+
+    def submit(self, op, *args):
+        if op not in POOL_OPERATIONS:
+            raise ValueError(f"Unknown pool operation: {op}")
+        if op == "create_account":
+            worker = next(self._next_worker)
+        elif op == "recover_account":
+            holders = self.contacts.holders(args[0] if args else None)
+            worker = self._owner[shard_of(holders[0], self.shards)] if holders else 0
+        else:
+            worker = self._owner[shard_of(args[0], self.shards)]
+
+        acc_no = None if op == "create_account" else (args[0] if args else None)
+        token = None
+        if op in ("create_account", "update_details"):
+            # create_account(name, email, phone, pin);
+            # update_details(acc_no, pin, name, email, phone, new_pin)
+            padded = args + (None,) * 6
+            email, phone = padded[1:3] if op == "create_account" else padded[3:5]
+            token = object()
+            error = self.contacts.claim(token, email, phone, acc_no)
+            if error:
+                future = Future()
+                future.set_exception(service.DuplicateError(error))
+                return future
+        future = self._send(worker, op, args)
+        if token is not None or op == "delete_account":
+            future.add_done_callback(lambda done: self._settle(op, acc_no, token, done))
+        return future
+
+    def _send(self, worker, op, args):
+        future = Future()
+        with self._lock:
+            call_id = next(self._ids)
+            self._futures[call_id] = future
+        self._requests[worker].put((call_id, op, args))
+        return future
+
+    def _settle(self, op, acc_no, token, future):
+        # Turns a call's claim into the account's keys once it has succeeded
+        if future.exception() is None:
+            account = future.result()
+            self.contacts.remove(account.acc_no)
+            if op != "delete_account":
+                self.contacts.add(account.acc_no, account.email, account.phone)
+        if token is not None:
+            self.contacts.remove(token)
+
+    def call(self, op, *args):
+        return self.submit(op, *args).result()
+
+    def _collect(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            call_id, ok, value = item
+            with self._lock:
+                future = self._futures.pop(call_id)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def close(self):
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join()
+        self._results.put(None)
+        self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Rebalancing ---
+
+def _remove_shard_files(path):
+    base = os.path.splitext(path)[0]
+    history = history_path(path)
+    for name in (path, base + '.wal', base + '.lock', base + '.stats.json',
+                 history, history + '-wal', history + '-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def _move_history(old_paths, new_paths, chunk_size):
+    # Copied in id order, so each account's entries keep their order
+    new = [TransactionHistory(history_path(new_path)) for new_path in new_paths]
+    try:
+        for old_path in old_paths:
+            if not os.path.exists(history_path(old_path)):
+                continue
+            old = TransactionHistory(history_path(old_path))
+            try:
+                for rows in chunked(old.entries(), chunk_size):
+                    groups = {}
+                    for row in rows:
+                        groups.setdefault(shard_of(row[0], len(new)), []).append(row)
+                    for index, group in groups.items():
+                        new[index].copy_entries(group)
+            finally:
+                old.close()
+    finally:
+        for history in new:
+            history.close()
+
+
+def rebalance(path, shards, mode=None, chunk_size=10000, source=None):
+    """
+    Moves every account into a layout of ``shards`` shards and returns how
+    many were moved. The new shards are written in full before the manifest
+    switches to them, so an interrupted run leaves the old layout in charge.
+    ``source`` is the storage mode of a database that isn't sharded yet.
+    """
+    manifest = read_manifest(path)
+    if manifest is not None:
+        old = ShardedStore(path)
+        old_paths = [shard_path(path, old.shards, index) for index in range(old.shards)]
+        mode = mode or old.mode
+    else:
+        source = source or os.environ.get("BANK_STORAGE")
+        # A JournalStore reads snapshot-mode files too
+        old = open_store(path, "journal" if source in (None, "", "sharded") else source)
+        old_paths = []
+        mode = mode or os.environ.get("BANK_SHARD_MODE", DEFAULT_SHARD_MODE)
+    if manifest is not None and old.shards == shards:
+        if old.mode != mode:
+            raise ValueError("Switching the shard mode needs a different shard count")
+        return 0
+
+    old.load()
+    try:
+        with old.exclusive():
+            new_paths = [shard_path(path, shards, index) for index in range(shards)]
+            for new_path in new_paths:
+                if new_path not in old_paths:
+                    _remove_shard_files(new_path)
+            new = [SHARD_MODES[mode](new_path) for new_path in new_paths]
+            for store in new:
+                store.load()
+            moved = 0
+            for chunk in chunked(iter(old), chunk_size):
+                groups = {}
+                for record in chunk:
+                    groups.setdefault(shard_of(record.acc_no, shards), []).append(record.copy())
+                for index, records in groups.items():
+                    new[index].put_many(records)
+                moved += len(chunk)
+            # Money flows can't be recounted from balances; carry them over in shard 0
+            flows = old.stats()
+            new[0].accounts.stats.restore_flows({key: flows[key] for key in FLOWS})
+            _move_history(old_paths or [path], new_paths, chunk_size)
+            for store in new:
+                if isinstance(store, JournalStore):
+                    store.compact()
+                else:
+                    store._write_snapshot()
+                store.close()
+            write_manifest(path, shards, mode)
+    finally:
+        old.close()
+    for old_path in old_paths:
+        if old_path not in new_paths:
+            _remove_shard_files(old_path)
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage a sharded account store.")
+    parser.add_argument("--database", default="database.json")
+    commands = parser.add_subparsers(dest="command", required=True)
+    move = commands.add_parser("rebalance", help="move the accounts into N shards (stop writers first)")
+    move.add_argument("--shards", type=int, required=True)
+    move.add_argument("--mode", choices=sorted(SHARD_MODES), help="shard storage (default: keep)")
+    move.add_argument("--from-storage", choices=sorted(set(STORE_MODES) - {"sharded"}),
+                      help="storage of a database that isn't sharded yet (default: $BANK_STORAGE)")
+    commands.add_parser("status", help="show the layout and accounts per shard")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebalance":
+        if args.shards < 1:
+            parser.error("--shards must be at least 1")
+        moved = rebalance(args.database, args.shards, args.mode, source=args.from_storage)
+        print(f"Moved {moved} accounts into {args.shards} shards.")
+        return
+
+    if read_manifest(args.database) is None:
+        print(f"{args.database} is not sharded.")
+        return
+    store = ShardedStore(args.database).load()
+    try:
+        print(f"{store.shards} shards ({store.mode})")
+        for index, size in store.sizes().items():
+            print(f"  shard {index}: {size} accounts")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
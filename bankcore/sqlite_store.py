@@ -0,0 +1,246 @@
+"""
+SQLite storage backend.
+
+Accounts live in one table keyed by account number, so lookups go through
+the primary-key index and a deposit is a single-row upsert instead of a
+rewrite of the whole database. Only the rows being used are ever in memory.
+The database runs in WAL mode: readers never block the writer, and commits
+append to the -wal file rather than rewriting pages in place.
+
+The dashboard totals (see ``bankcore.aggregates``) live in a small ``stats``
+table that every put and delete adjusts in the same transaction, so
+``stats()`` reads a dozen rows however many accounts there are.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from bankcore.accounts import Account, as_account, email_key, phone_key
+from bankcore.aggregates import FIELDS, Aggregates
+from bankcore.backend import StorageBackend
+from bankcore.metrics import timed_call
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    acc_no  TEXT PRIMARY KEY,
+    name    TEXT,
+    email   TEXT,
+    phone   INTEGER,
+    pin,
+    balance INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Every statement uses the column order of Account's constructor
+SELECT_ONE = "SELECT name, email, phone, pin, acc_no, balance FROM accounts WHERE acc_no = ?"
+SELECT_ALL = "SELECT name, email, phone, pin, acc_no, balance FROM accounts ORDER BY rowid"
+UPSERT = """
+INSERT INTO accounts (name, email, phone, pin, acc_no, balance) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(acc_no) DO UPDATE SET
+    name = excluded.name, email = excluded.email, phone = excluded.phone,
+    pin = excluded.pin, balance = excluded.balance
+"""
+DELETE = "DELETE FROM accounts WHERE acc_no = ?"
+COUNT = "SELECT COUNT(*) FROM accounts"
+
+# Secondary indexes for duplicate checks and account recovery
+INDEXES = """
+CREATE INDEX IF NOT EXISTS accounts_by_email ON accounts (lower(trim(email)));
+CREATE INDEX IF NOT EXISTS accounts_by_phone ON accounts (phone);
+"""
+SELECT_BY_EMAIL = "SELECT acc_no FROM accounts WHERE lower(trim(email)) = ?"
+SELECT_BY_PHONE = "SELECT acc_no FROM accounts WHERE phone = ?"
+
+STATS_SCHEMA = "CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+SELECT_BALANCE = "SELECT balance FROM accounts WHERE acc_no = ?"
+SELECT_BALANCES = "SELECT balance FROM accounts"
+SELECT_STATS = "SELECT key, value FROM stats"
+SET_STAT = "INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)"
+ADD_STAT = "UPDATE stats SET value = value + ? WHERE key = ?"
+
+
+def row_to_record(row):
+    return Account(*row)
+
+
+def record_to_row(record):
+    # Keys outside the schema (Account.extra) have no column and are dropped
+    a = as_account(record)
+    return (a.name, a.email, a.phone, a.pin, a.acc_no, a.balance)
+
+
+class SQLiteStore(StorageBackend):
+    """Account storage in an SQLite database file."""
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads, so each
+        # thread gets its own. The module caches prepared statements per
+        # connection, so the constant SQL above is compiled once per thread.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def load(self):
+        conn = self._conn()
+        conn.execute(SCHEMA)
+        conn.executescript(INDEXES)
+        conn.execute(STATS_SCHEMA)
+        with self._atomic(conn):
+            if conn.execute("SELECT COUNT(*) FROM stats").fetchone()[0] == 0:
+                self._rebuild_stats(conn)
+        return self
+
+    def accounts_by_email(self, email):
+        key = email_key(email)
+        return [row[0] for row in self._conn().execute(SELECT_BY_EMAIL, (key,))] if key else []
+
+    def accounts_by_phone(self, phone):
+        key = phone_key(phone)
+        return [row[0] for row in self._conn().execute(SELECT_BY_PHONE, (key,))] if key is not None else []
+
+    def stats(self):
+        values = dict(self._conn().execute(SELECT_STATS))
+        return {key: values.get(key, 0) for key in FIELDS}
+
+    @contextmanager
+    def transaction(self, acc_no):
+        with self.transaction_many((acc_no,)):
+            yield self.get(acc_no)
+
+    @contextmanager
+    def transaction_many(self, acc_nos):
+        """
+        Holds SQLite's write lock for the read-modify-write. BEGIN IMMEDIATE
+        takes it up front, so two writers can't both read the old balance.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def exclusive(self):
+        # The write lock covers the whole database already
+        return self.transaction_many(())
+
+    @contextmanager
+    def _atomic(self, conn):
+        # Joins the caller's transaction, or runs one of its own
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def __len__(self):
+        return self._conn().execute(COUNT).fetchone()[0]
+
+    def __iter__(self):
+        # The cursor streams rows, so iterating never holds the whole table
+        for row in self._conn().execute(SELECT_ALL):
+            yield row_to_record(row)
+
+    @timed_call
+    def get(self, acc_no):
+        row = self._conn().execute(SELECT_ONE, (acc_no,)).fetchone()
+        return row_to_record(row) if row else None
+
+    @timed_call
+    def put(self, record):
+        self.put_many((record,))
+
+    @timed_call
+    def put_many(self, records):
+        rows = [record_to_row(record) for record in records]
+        conn = self._conn()
+        with self._atomic(conn):
+            delta = Aggregates()
+            balances = {}
+            for row in rows:
+                acc_no, balance = row[4], row[5]
+                if acc_no not in balances:
+                    found = conn.execute(SELECT_BALANCE, (acc_no,)).fetchone()
+                    balances[acc_no] = found[0] if found else None
+                delta.change(balances[acc_no], balance)
+                balances[acc_no] = balance
+            conn.executemany(UPSERT, rows)
+            self._add_stats(conn, delta)
+
+    @timed_call
+    def delete(self, acc_no):
+        conn = self._conn()
+        with self._atomic(conn):
+            record = self.get(acc_no)
+            if record is not None:
+                conn.execute(DELETE, (acc_no,))
+                delta = Aggregates()
+                delta.change(record.balance, None)
+                self._add_stats(conn, delta)
+        return record
+
+    @staticmethod
+    def _add_stats(conn, delta):
+        conn.executemany(ADD_STAT, [(value, key) for key, value in delta.to_dict().items() if value])
+
+    @staticmethod
+    def _rebuild_stats(conn):
+        """Recounts the balance totals from every row; the money flows are kept."""
+        totals = Aggregates()
+        totals.restore_flows(dict(conn.execute(SELECT_STATS)))
+        for (balance,) in conn.execute(SELECT_BALANCES):
+            totals.change(None, balance)
+        conn.executemany(SET_STAT, totals.to_dict().items())
+
+    @timed_call
+    def import_records(self, records, chunk_size=10000):
+        """Bulk-loads records in chunked transactions; returns the count."""
+        conn = self._conn()
+        total = 0
+        chunk = []
+        for record in records:
+            chunk.append(record_to_row(record))
+            if len(chunk) >= chunk_size:
+                total += self._import_chunk(conn, chunk)
+                chunk = []
+        if chunk:
+            total += self._import_chunk(conn, chunk)
+        # One recount is cheaper than a balance lookup per imported row
+        with self._atomic(conn):
+            self._rebuild_stats(conn)
+        return total
+
+    @staticmethod
+    def _import_chunk(conn, rows):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(UPSERT, rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return len(rows)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
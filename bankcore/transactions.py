@@ -0,0 +1,86 @@
+"""Deposit/withdraw rules and the batch transaction API."""
+
+from bankcore.history import history_for
+
+DEPOSIT_LIMIT = 100000
+WITHDRAW_LIMIT = 10000
+
+DEPOSIT = "deposit"
+WITHDRAW = "withdraw"
+# Entries the end-of-day job (bankcore.eod) adds to the history
+INTEREST = "interest"
+FEE = "fee"
+CREDITS = (DEPOSIT, INTEREST)
+
+
+def check_amount(kind, amount, balance):
+    """
+    Validates one deposit or withdrawal against the bank's limits.
+
+    Returns an error message, or None if the transaction is allowed. The
+    messages match the ones the Tkinter front-end has always shown.
+    """
+    if kind not in (DEPOSIT, WITHDRAW):
+        return f"Unknown transaction type: {kind}."
+    if amount <= 0:
+        return "Invalid amount. Must be positive."
+    if kind == DEPOSIT and amount > DEPOSIT_LIMIT:
+        return "Deposit limit is 100,000."
+    if kind == WITHDRAW and amount > WITHDRAW_LIMIT:
+        return "Withdrawal limit is 10,000."
+    if kind == WITHDRAW and amount > balance:
+        return "Insufficient balance."
+    return None
+
+
+def apply_batch(store, transactions):
+    """
+    Applies many (account, kind, amount) records in one pass.
+
+    Rows are validated and applied in order against running balances, so a
+    deposit earlier in the batch can fund a withdrawal later on. Rows that
+    fail are skipped without affecting the rest. All touched accounts are
+    locked for the duration and persisted with a single ``put_many``.
+
+    Returns one result dict per row: account, kind, amount, ok, and either
+    the new balance or an error message.
+    """
+    rows = list(transactions)
+    results = []
+    changed = {}
+
+    with store.transaction_many({row[0] for row in rows}):
+        for acc_no, kind, amount in rows:
+            result = {"account": acc_no, "kind": kind, "amount": amount,
+                      "ok": False, "balance": None, "error": None}
+            results.append(result)
+
+            record = changed.get(acc_no)
+            if record is None:
+                stored = store.get(acc_no)
+                if stored is None:
+                    result["error"] = "Account not found."
+                    continue
+                # Work on a copy so a failed write leaves memory untouched
+                record = stored.copy()
+
+            try:
+                amount = int(amount)
+            except (TypeError, ValueError):
+                result["error"] = "Amount must be numeric."
+                continue
+
+            error = check_amount(kind, amount, record.balance)
+            if error:
+                result["error"] = error
+                continue
+
+            record.balance += amount if kind == DEPOSIT else -amount
+            changed[acc_no] = record
+            result.update(amount=amount, ok=True, balance=record.balance)
+
+        if changed:
+            store.put_many(changed.values())
+            history_for(store).record_many((r["account"], r["kind"], r["amount"], r["balance"])
+                                           for r in results if r["ok"])
+    return results
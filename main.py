@@ -1,38 +1,46 @@
 #8/11/25
 
+"""
+Console front-end.
 
+    python main.py                                   # the interactive menu
+    python main.py create --name A --email a@x.com --phone 9876543210 --pin 1234
+    python main.py deposit <acc_no> --pin 1234 --amount 500
+    python main.py withdraw <acc_no> --pin 1234 --amount 200
+    python main.py details <acc_no> --pin 1234
+    python main.py update <acc_no> --pin 1234 [--name ...] [--email ...] [--phone ...] [--new-pin ...]
+    python main.py delete <acc_no> --pin 1234
+    python main.py recover --contact a@x.com --pin 1234   # forgotten account number
+    python main.py shell < commands.txt              # one command per line, one warm process
 
-from pathlib import Path
+``shell`` reads commands from stdin in the same syntax (without the
+``python main.py`` prefix) and keeps the store loaded between them, so a
+stream of thousands of operations pays for start-up and the database load
+once. A failing line is reported on stderr and the stream carries on.
+Add ``--json`` to print each result as one JSON object per line.
+"""
+
+import argparse
 import json
-import random
-import string
+import shlex
+import sys
+
+from bankcore import DEPOSIT_LIMIT, WITHDRAW_LIMIT, LazyStore, shared_store
+from bankcore import service
+from bankcore.account_numbers import allocator_for
+from bankcore.accounts import check_unique, contact_locks
+from bankcore.credentials import hash_pin
+from bankcore.history import history_for
+from bankcore.transactions import DEPOSIT, WITHDRAW, apply_batch as apply_transactions
 
 class Bank:
     database = 'database.json'
-    data = []
-
-    try: 
-        if Path(database).exists():
-            with open(database) as fs:
-                data = json.loads(fs.read())
-        else:
-            print("Sorry we are facing some issues: ")
-
-    except Exception as err:
-        print(f"An error occured as {err}")
+    # Loaded on first use, so importing this module doesn't read the database
+    data = LazyStore(database)
 
     @classmethod
-    def __update(cls):
-        with open(cls.database, 'w') as fs:
-            fs.write(json.dumps(cls.data))
-    
-    @staticmethod
-    def __accountno():
-        alpha = random.choices(string.ascii_letters, k=5)
-        digits = random.choices(string.digits, k=4)
-        id = alpha + digits
-        random.shuffle(id)
-        return "".join(id)
+    def __update(cls, user_data):
+        cls.data.put(user_data)
     
     def create_account(self):
         d = {
@@ -40,7 +48,7 @@ class Bank:
             "email": input("Please enter your email: "),
             "phone no.": int(input("Enter your phone number: ")),
             "pin": int(input("Enter your pin: ")),
-            "Account no.": Bank.__accountno(),
+            "Account no.": allocator_for(Bank.data).allocate(),
             "Balance": 0         
         }
         print(f"Please remember your account number: {d['Account no.']}")
@@ -52,13 +60,19 @@ class Bank:
             print("Please review your phone number!")
 
         else:
-            Bank.data.append(d)
-            Bank.__update()
+            d['pin'] = hash_pin(d['pin'])
+            with Bank.data.transaction_many([d['Account no.']] + contact_locks(d['email'], d['phone no.'])):
+                error = check_unique(Bank.data, d['email'], d['phone no.'])
+                if error:
+                    print(error)
+                else:
+                    Bank.__update(d)
+        allocator_for(Bank.data).release([d['Account no.']])
 
     def deposite_money(self):
         accNo = input("Enter your account no.: ")
         pin = int(input("Enter your pin: "))
-        user_data = [i for i in Bank.data if i['Account no.'] == accNo and i['pin'] == pin]
+        user_data = Bank.data.find(accNo, pin)
         print(user_data)
         if not user_data:
             print("user not found")
@@ -66,17 +80,25 @@ class Bank:
             amount = int(input("Enter amount to be deposited: "))
             if amount <= 0:
                 print("Invalid amount")
-            elif amount > 100000:
+            elif amount > DEPOSIT_LIMIT:
                 print("Greater than 100000")
             else:
-                user_data[0]['Balance'] += amount
-                Bank.__update()
+                # Re-read under the account lock so concurrent writers aren't lost
+                with Bank.data.transaction(accNo) as stored:
+                    if stored is None:
+                        print("user not found")
+                        return
+                    # Change a copy so memory still matches disk if the write fails
+                    user_data = stored.copy()
+                    user_data['Balance'] += amount
+                    Bank.__update(user_data)
+                    history_for(Bank.data).record(accNo, DEPOSIT, amount, user_data['Balance'])
                 print("Amount credited")
 
     def withdraw_money(self):
         accNo = input("Enter your account no.: ")
         pin = int(input("Enter your pin: "))
-        user_data = [i for i in Bank.data if i['Account no.'] == accNo and i['pin'] == pin]
+        user_data = Bank.data.find(accNo, pin)
         print(user_data)
         if not user_data:
             print("user not found")
@@ -84,27 +106,34 @@ class Bank:
             amount = int(input("Enter amount to be withdrawn: "))
             if amount <= 0:
                 print("Invalid amount")
-            elif amount > 10000:
+            elif amount > WITHDRAW_LIMIT:
                 print("Greater than 10000")
             else:
-                user_data[0]['Balance'] -= amount
-                Bank.__update()
+                with Bank.data.transaction(accNo) as stored:
+                    if stored is None:
+                        print("user not found")
+                        return
+                    # Change a copy so memory still matches disk if the write fails
+                    user_data = stored.copy()
+                    user_data['Balance'] -= amount
+                    Bank.__update(user_data)
+                    history_for(Bank.data).record(accNo, WITHDRAW, amount, user_data['Balance'])
                 print("Amount Debited")
 
     def details(self):
         accNo = input("Enter your account no.: ")
         pin = int(input("Enter your pin: "))
-        user_data = [i for i in Bank.data if i['Account no.'] == accNo and i['pin'] == pin]
+        user_data = Bank.data.find(accNo, pin)
         if not user_data:
             print("User not found!")
         else:
-            for i in user_data[0]:
-                print(f"{i}: {user_data[0][i]}")
+            for i in user_data:
+                print(f"{i}: {user_data[i]}")
      
     def update_details(self):
         accNo = input("Enter your account no.: ")
         pin = int(input("Enter your pin: "))
-        user_data = [i for i in Bank.data if i['Account no.'] == accNo and i['pin'] == pin]
+        user_data = Bank.data.find(accNo, pin)
         if not user_data:
             print("User not found!")
         else:
@@ -116,68 +145,247 @@ class Bank:
                 'phone no.': (input("Enter your new phone no.:")),
                 'pin': (input("Enter your new pin:"))
             }
+            if new_data['pin'] != "":
+                new_data['pin'] = hash_pin(new_data['pin'])
 
-            new_data["Account no."] = user_data[0]["Account no."]
-            new_data["Balance"] = user_data[0]["Balance"]
-            
-            for i in new_data:
-                if new_data[i] == "":
-                    new_data[i] = user_data[0][i]
-            print(new_data)
-
-            for i in user_data[0]:
-                if user_data[0][i] == new_data[i]:
-                    continue
-                else:
-                    if isinstance(new_data[i], str) and new_data[i].isnumeric():
-                        user_data[0][i] = int(new_data[i])
+            # The new email and phone are locked too, so no one else can take them meanwhile
+            with Bank.data.transaction_many([accNo] + contact_locks(new_data['email'], new_data['phone no.'])):
+                stored = Bank.data.get(accNo)
+                if stored is None:
+                    print("User not found!")
+                    return
+                # Edit a copy: a rejected update must leave the stored record alone
+                user_data = stored.copy()
+                new_data["Account no."] = user_data["Account no."]
+                new_data["Balance"] = user_data["Balance"]
+                
+                for i in new_data:
+                    if new_data[i] == "":
+                        new_data[i] = user_data[i]
+                print(new_data)
+
+                for i in user_data:
+                    if user_data[i] == new_data[i]:
+                        continue
                     else:
-                        user_data[0][i] = new_data[i]
-            
-            print(user_data)  
-            Bank.__update()   
+                        if isinstance(new_data[i], str) and new_data[i].isnumeric():
+                            user_data[i] = int(new_data[i])
+                        else:
+                            user_data[i] = new_data[i]
+                
+                print(user_data)  
+                error = check_unique(Bank.data, user_data['email'], user_data['phone no.'], accNo)
+                if error:
+                    print(error)
+                    return
+                Bank.__update(user_data)   
             print("Details updated!")
 
     def delete_account(self):
         accNo = input("Enter your account no.: ")
         pin = int(input("Enter your pin: "))
-        user_data = [i for i in Bank.data if i['Account no.'] == accNo and i['pin'] == pin]
+        user_data = Bank.data.find(accNo, pin)
         
         if not user_data:
             print("User not found!")
         else:
-            for i in Bank.data:
-                if i["Account no."] == accNo and i["pin"] == pin:
-                    Bank.data.remove(i)
-                    break
-            
-            Bank.__update()
+            with Bank.data.transaction(accNo):
+                Bank.data.delete(accNo)
             print("Account deleted successfully!") 
 
-user = Bank()
-print("Press 1 for creating an account.")
-print("Press 2 to deposite money.")
-print("Press 3 to withdraw money.")
-print("Press 4 for account details.")
-print("Press 5 for updating the details.")
-print("Press 6 to deactivate your account.")
+    @staticmethod
+    def apply_batch(transactions):
+        """Applies many (account, kind, amount) records and saves them once."""
+        return apply_transactions(Bank.data, transactions)
+
+def menu():
+    try:
+        Bank.data
+    except Exception as err:
+        print(f"An error occured as {err}")
+        return
+
+    user = Bank()
+    print("Press 1 for creating an account.")
+    print("Press 2 to deposite money.")
+    print("Press 3 to withdraw money.")
+    print("Press 4 for account details.")
+    print("Press 5 for updating the details.")
+    print("Press 6 to deactivate your account.")
+
+    check = int(input("Enter your choice: "))
+
+    if check == 1:
+        user.create_account()
+
+    if check == 2:
+        user.deposite_money()
+
+    if check == 3:
+        user.withdraw_money()
 
-check = int(input("Enter your choice: "))
+    if check == 4:
+        user.details()
+
+    if check == 5:
+        user.update_details()
+
+    if check == 6:
+        user.delete_account()
+
+# --- Scriptable CLI ---
+
+class CommandError(Exception):
+    pass
+
+
+class CommandParser(argparse.ArgumentParser):
+    """Raises instead of exiting, so one bad line doesn't end a shell session."""
+
+    def error(self, message):
+        raise CommandError(message)
+
+
+def build_parser():
+    parser = CommandParser(prog="main.py", description="Bank operations from the command line.")
+    parser.add_argument("--database", default=Bank.database)
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    commands = parser.add_subparsers(dest="command", required=True, parser_class=CommandParser)
+
+    create = commands.add_parser("create", help="open an account")
+    create.add_argument("--name", required=True)
+    create.add_argument("--email", required=True)
+    create.add_argument("--phone", required=True)
+    create.add_argument("--pin", required=True)
+
+    for name, help_text in (("deposit", "credit an account"), ("withdraw", "debit an account")):
+        cmd = commands.add_parser(name, help=help_text)
+        cmd.add_argument("acc_no")
+        cmd.add_argument("--pin", required=True)
+        cmd.add_argument("--amount", required=True)
+
+    for name, help_text in (("details", "show an account"), ("delete", "close an account")):
+        cmd = commands.add_parser(name, help=help_text)
+        cmd.add_argument("acc_no")
+        cmd.add_argument("--pin", required=True)
+
+    update = commands.add_parser("update", help="change name, email, phone or PIN")
+    update.add_argument("acc_no")
+    update.add_argument("--pin", required=True)
+    update.add_argument("--name")
+    update.add_argument("--email")
+    update.add_argument("--phone")
+    update.add_argument("--new-pin")
+
+    recover = commands.add_parser("recover", help="find an account by email or phone and PIN")
+    recover.add_argument("--contact", required=True, help="the account's email or phone number")
+    recover.add_argument("--pin", required=True)
+
+    commands.add_parser("shell", help="read commands from stdin, one per line")
+    return parser
+
+
+def run_command(store, args):
+    """Runs one parsed command; returns (message, account) or raises BankError."""
+    if args.command == "create":
+        account = service.create_account(store, args.name, args.email, args.phone, args.pin)
+        return f"Account created. Please remember your account number: {account.acc_no}", account
+    if args.command == "deposit":
+        account = service.deposit(store, args.acc_no, args.pin, args.amount)
+        return f"Amount credited. New balance: {account.balance}", account
+    if args.command == "withdraw":
+        account = service.withdraw(store, args.acc_no, args.pin, args.amount)
+        return f"Amount debited. New balance: {account.balance}", account
+    if args.command == "details":
+        account = service.details(store, args.acc_no, args.pin)
+        return "\n".join(f"{k}: {v}" for k, v in account.items() if k != "pin"), account
+    if args.command == "update":
+        account = service.update_details(store, args.acc_no, args.pin, args.name, args.email,
+                                         args.phone, args.new_pin)
+        return "Details updated!", account
+    if args.command == "delete":
+        account = service.delete_account(store, args.acc_no, args.pin)
+        return "Account deleted successfully!", account
+    if args.command == "recover":
+        account = service.recover_account(store, args.contact, args.pin)
+        return f"Your account number is: {account.acc_no}", account
+    raise CommandError(f"{args.command} can't be used here")
+
+
+def report(args, ok, message, account=None):
+    if args.json:
+        result = {"command": args.command, "ok": ok}
+        if ok:
+            result["account"] = {k: v for k, v in account.items() if k != "pin"}
+        else:
+            result["error"] = message
+        print(json.dumps(result))
+    elif ok:
+        print(message)
+    else:
+        print(f"Error: {message}", file=sys.stderr)
 
-if check == 1:
-    user.create_account()
 
-if check == 2:
-    user.deposite_money()
+def shell(parser, args, store, lines=None):
+    """Runs one command per input line; returns the number that failed."""
+    lines = sys.stdin if lines is None else lines
+    interactive = lines.isatty()
+    failed = 0
+    while True:
+        if interactive:
+            print("bank> ", end="", flush=True)
+        line = lines.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line in ("quit", "exit"):
+            break
+        try:
+            # Per-line options (e.g. --json) fall back to the session's
+            words = shlex.split(line)
+            cmd = parser.parse_args(["--database", args.database] + (["--json"] if args.json else []) + words)
+            if cmd.database != args.database or cmd.command == "shell":
+                raise CommandError("--database and shell can't be used inside the shell")
+            message, account = run_command(store, cmd)
+        except (CommandError, ValueError) as err:
+            failed += 1
+            print(f"Error: {err}", file=sys.stderr)
+            continue
+        except SystemExit:
+            # --help inside the shell; argparse has already printed it
+            continue
+        except service.BankError as err:
+            failed += 1
+            report(cmd, False, str(err))
+            continue
+        report(cmd, True, message, account)
+    return failed
 
-if check == 3:
-    user.withdraw_money()
 
-if check == 4:
-    user.details()
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        menu()
+        return
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandError as err:
+        parser.print_usage(sys.stderr)
+        print(f"{parser.prog}: error: {err}", file=sys.stderr)
+        sys.exit(2)
+    store = shared_store(args.database)
+    if args.command == "shell":
+        sys.exit(1 if shell(parser, args, store) else 0)
+    try:
+        message, account = run_command(store, args)
+    except service.BankError as err:
+        report(args, False, str(err))
+        sys.exit(1)
+    report(args, True, message, account)
 
-if check == 5:
-    user.update_details()
 
-if check == 6:
-    user.delete_account()
+if __name__ == "__main__":
+    main()
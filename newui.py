@@ -1,77 +1,58 @@
-from pathlib import Path
-import json
-import random
-import string
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 
+from bankcore import DEPOSIT_LIMIT, WITHDRAW_LIMIT, LazyStore
+from bankcore.account_numbers import allocator_for
+from bankcore.accounts import check_new_account, check_unique, contact_locks, new_account_record
+from bankcore.history import history_for
+from bankcore.transactions import DEPOSIT, WITHDRAW, apply_batch as apply_transactions
+
 # --- Bank Class Definition (Modified for better integration) ---
 
 class Bank:
     # Class attributes for database management
     database = 'database.json'
-    data = []
-
-    # Initialize and load data upon class definition
-    try: 
-        if Path(database).exists():
-            with open(database) as fs:
-                # Load existing data, defaulting to an empty list if file is empty
-                content = fs.read()
-                data = json.loads(content) if content else []
-        else:
-            # If database.json doesn't exist, it will be created on the first update
-            print("Database file not found. A new one will be created.")
+    # Loaded on first access rather than at import; if database.json doesn't
+    # exist yet it is created on the first update
+    data = LazyStore(database)
 
-    except Exception as err:
-        print(f"An error occurred while loading data: {err}")
+    @classmethod
+    def __update(cls, user_data):
+        """Persists one new or changed account through the store."""
+        try:
+            cls.data.put(user_data)
+        except Exception as err:
+            messagebox.showerror("Database Error", f"Could not update database: {err}")
+            return False
+        return True
 
     @classmethod
-    def __update(cls):
-        """Saves the current state of cls.data back to the database file."""
+    def __remove(cls, accNo):
+        """Persists the removal of an account through the store."""
         try:
-            with open(cls.database, 'w') as fs:
-                json.dump(cls.data, fs, indent=4) # Use json.dump for better writing and indent for readability
+            cls.data.delete(accNo)
         except Exception as err:
             messagebox.showerror("Database Error", f"Could not update database: {err}")
             return False
         return True
     
-    @staticmethod
-    def __accountno():
-        """Generates a unique 9-character alphanumeric account number."""
-        alpha = random.choices(string.ascii_letters, k=5)
-        digits = random.choices(string.digits, k=4)
-        id_list = alpha + digits
-        random.shuffle(id_list)
-        return "".join(id_list)
-
     @classmethod
     def create_account(cls, name, email, phone_no, pin):
         """Creates a new account and saves it."""
-        try:
-            phone_no = int(phone_no)
-            pin = int(pin)
-        except ValueError:
-            return "Error: Phone number and PIN must be numeric."
-
-        if len(str(pin)) != 4:
-            return "Error: PIN must be exactly 4 digits."
-        
-        if len(str(phone_no)) != 10:
-            return "Error: Phone number must be exactly 10 digits."
-
-        d = {
-            "name": name,
-            "email": email,
-            "phone no.": phone_no,
-            "pin": pin,
-            "Account no.": Bank.__accountno(),
-            "Balance": 0        
-        }
-        
-        cls.data.append(d)
-        if cls.__update():
+        error = check_new_account(name, email, phone_no, pin)
+        if error:
+            return f"Error: {error}"
+
+        # The allocator guarantees a number no other account has
+        with allocator_for(cls.data).reserve() as (acc_no,):
+            d = new_account_record(name, email, phone_no, pin, acc_no)
+            # The email and phone are locked too, so another signup with either waits
+            with cls.data.transaction_many([acc_no] + contact_locks(email, phone_no)):
+                error = check_unique(cls.data, email, phone_no)
+                if error:
+                    return f"Error: {error}"
+                saved = cls.__update(d)
+        if saved:
             return f"Success! Account created. Account No: {d['Account no.']}"
         else:
             return "Error: Account created locally but failed to save to database."
@@ -84,57 +65,65 @@ class Bank:
         except ValueError:
             return None # Pin is not an integer
 
-        # Find the specific user dictionary in the data list
-        user_data = next((i for i in cls.data if i['Account no.'] == accNo and i['pin'] == pin), None)
-        return user_data
+        # O(1) lookup through the account-number index
+        return cls.data.find(accNo, pin)
 
     @classmethod
     def deposit_money(cls, accNo, pin, amount):
         """Deposits money into an account."""
-        user_data = cls.__find_user(accNo, pin)
-        if not user_data:
-            return "Error: User not found or incorrect PIN."
+        # Hold the account's lock across the read-modify-write
+        with cls.data.transaction(accNo):
+            user_data = cls.__find_user(accNo, pin)
+            if not user_data:
+                return "Error: User not found or incorrect PIN."
         
-        try:
-            amount = int(amount)
-        except ValueError:
-            return "Error: Amount must be numeric."
-
-        if amount <= 0:
-            return "Error: Invalid amount. Must be positive."
-        elif amount > 100000:
-            return "Error: Deposit limit is 100,000."
-        else:
-            user_data['Balance'] += amount
-            if cls.__update():
-                return f"Success! Amount credited. New Balance: {user_data['Balance']}"
+            try:
+                amount = int(amount)
+            except ValueError:
+                return "Error: Amount must be numeric."
+
+            if amount <= 0:
+                return "Error: Invalid amount. Must be positive."
+            elif amount > DEPOSIT_LIMIT:
+                return "Error: Deposit limit is 100,000."
             else:
-                return "Error: Deposit successful locally but failed to save to database."
+                # Change a copy so memory still matches disk if the write fails
+                user_data = user_data.copy()
+                user_data['Balance'] += amount
+                if cls.__update(user_data):
+                    history_for(cls.data).record(accNo, DEPOSIT, amount, user_data['Balance'])
+                    return f"Success! Amount credited. New Balance: {user_data['Balance']}"
+                else:
+                    return "Error: Deposit successful locally but failed to save to database."
 
     @classmethod
     def withdraw_money(cls, accNo, pin, amount):
         """Withdraws money from an account."""
-        user_data = cls.__find_user(accNo, pin)
-        if not user_data:
-            return "Error: User not found or incorrect PIN."
-
-        try:
-            amount = int(amount)
-        except ValueError:
-            return "Error: Amount must be numeric."
+        # Hold the account's lock across the read-modify-write
+        with cls.data.transaction(accNo):
+            user_data = cls.__find_user(accNo, pin)
+            if not user_data:
+                return "Error: User not found or incorrect PIN."
+
+            try:
+                amount = int(amount)
+            except ValueError:
+                return "Error: Amount must be numeric."
         
-        if amount <= 0:
-            return "Error: Invalid amount. Must be positive."
-        elif amount > 10000:
-            return "Error: Withdrawal limit is 10,000."
-        elif amount > user_data['Balance']:
-            return "Error: Insufficient balance."
-        else:
-            user_data['Balance'] -= amount
-            if cls.__update():
-                return f"Success! Amount debited. New Balance: {user_data['Balance']}"
+            if amount <= 0:
+                return "Error: Invalid amount. Must be positive."
+            elif amount > WITHDRAW_LIMIT:
+                return "Error: Withdrawal limit is 10,000."
+            elif amount > user_data['Balance']:
+                return "Error: Insufficient balance."
             else:
-                return "Error: Withdrawal successful locally but failed to save to database."
+                user_data = user_data.copy()
+                user_data['Balance'] -= amount
+                if cls.__update(user_data):
+                    history_for(cls.data).record(accNo, WITHDRAW, amount, user_data['Balance'])
+                    return f"Success! Amount debited. New Balance: {user_data['Balance']}"
+                else:
+                    return "Error: Withdrawal successful locally but failed to save to database."
 
     @classmethod
     def get_details(cls, accNo, pin):
@@ -151,17 +140,25 @@ class Bank:
     @classmethod
     def delete_account(cls, accNo, pin):
         """Deletes an account permanently."""
-        user_data = cls.__find_user(accNo, pin)
-        if not user_data:
-            return "Error: User not found or incorrect PIN."
+        # Hold the account's lock across the read-modify-write
+        with cls.data.transaction(accNo):
+            user_data = cls.__find_user(accNo, pin)
+            if not user_data:
+                return "Error: User not found or incorrect PIN."
         
-        # Remove the user dictionary from the class data list
-        cls.data.remove(user_data)
-        
-        if cls.__update():
-            return "Success! Account deleted successfully."
-        else:
-            return "Error: Account deleted locally but failed to save to database."
+            # Remove the user from the account index and the database
+            if cls.__remove(user_data['Account no.']):
+                return "Success! Account deleted successfully."
+            else:
+                return "Error: Account deleted locally but failed to save to database."
+
+    @classmethod
+    def apply_batch(cls, transactions):
+        """
+        Applies many (account, kind, amount) records, e.g. a payroll run, and
+        saves them with one write. Returns a result dict per row.
+        """
+        return apply_transactions(cls.data, transactions)
 
 # --- Tkinter GUI Implementation ---
 
@@ -364,7 +361,16 @@ class BankGUI:
 
 
 # Main Tkinter Loop
-if __name__ == '__main__':
+def main():
+    try:
+        Bank.data
+    except Exception as err:
+        print(f"An error occurred while loading data: {err}")
+        return
     root = tk.Tk()
     app = BankGUI(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
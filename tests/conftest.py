@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+# Cheap PIN hashes keep account setup fast; nothing here depends on the cost
+os.environ.setdefault("BANK_PIN_ITERATIONS", "1000")
+
+from bankcore import service  # after the iteration count is set
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Path of a fresh database.json in a temporary directory."""
+    return str(tmp_path / "database.json")
+
+
+@pytest.fixture
+def create_accounts():
+    """``create_accounts(store, n)`` opens n accounts with PIN 1234 and returns their numbers."""
+    def create(store, count):
+        return [service.create_account(store, "A", f"a{i}@example.com", f"98765{i:05d}", "1234").acc_no
+                for i in range(count)]
+    return create
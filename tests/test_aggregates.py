@@ -0,0 +1,27 @@
+import pytest
+
+from bankcore import service
+from bankcore.storage import STORE_MODES, open_store
+
+MODES = sorted(STORE_MODES)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_totals_survive_a_reload(database, create_accounts, mode):
+    store = open_store(database, mode).load()
+    accounts = create_accounts(store, 3)
+    service.deposit(store, accounts[0], "1234", 500)
+    service.deposit(store, accounts[1], "1234", 2000)
+    service.withdraw(store, accounts[1], "1234", 300)
+    before = store.stats()
+    store.close()
+
+    store = open_store(database, mode).load()
+    try:
+        after = store.stats()
+        assert after == before
+        assert (after["credited"], after["credits"], after["debited"], after["debits"]) == (2500, 2, 300, 1)
+        assert after["total_balance"] == sum(record.balance for record in store) == 2200
+        assert after["balance_1000"] == 1
+    finally:
+        store.close()
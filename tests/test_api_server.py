@@ -0,0 +1,94 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_server import BankAPI, HttpError, read_request, serve_connection
+from bankcore import service
+from bankcore.storage import open_store
+
+
+def parse(raw):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_request(reader)
+    return asyncio.run(run())
+
+
+def test_reads_json_body():
+    method, path, _, headers, body = parse(
+        b'POST /accounts HTTP/1.1\r\nContent-Length: 13\r\n\r\n{"name": "A"}')
+    assert (method, path, body) == ("POST", "/accounts", {"name": "A"})
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1.5", b"\xb2"])
+def test_rejects_invalid_content_length(length):
+    with pytest.raises(HttpError) as err:
+        parse(b"POST /accounts HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+    assert err.value.status == 400
+
+
+def test_rejects_oversized_body():
+    with pytest.raises(HttpError) as err:
+        parse(b"POST /accounts HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")
+    assert err.value.status == 413
+
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def exchange(store, raw):
+    """Feeds ``raw`` to one connection and returns (status, body) of each response."""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        writer = Writer()
+        with ThreadPoolExecutor(2) as executor:
+            await serve_connection(BankAPI(store, executor), reader, writer)
+        return writer.data
+    responses = []
+    for response in asyncio.run(run()).split(b"HTTP/1.1 ")[1:]:
+        head, body = response.split(b"\r\n\r\n", 1)
+        responses.append((int(head[:3]), json.loads(body)))
+    return responses
+
+
+def test_pin_only_from_the_body_or_header(database, create_accounts):
+    store = open_store(database, "journal").load()
+    try:
+        acc_no, = create_accounts(store, 1)
+        responses = exchange(store,
+                             f"GET /accounts/{acc_no}?pin=1234 HTTP/1.1\r\n\r\n"
+                             f"GET /accounts/{acc_no} HTTP/1.1\r\nX-Pin: 1234\r\n\r\n".encode())
+        assert [status for status, _ in responses] == [401, 200]
+        assert "pin" not in responses[1][1]["account"]
+    finally:
+        store.close()
+
+
+def test_internal_errors_are_logged_not_returned(database, monkeypatch, caplog):
+    def broken(store, acc_no, pin):
+        raise RuntimeError("/srv/bank/database.json is corrupt")
+    monkeypatch.setattr(service, "details", broken)
+    store = open_store(database, "journal").load()
+    try:
+        [(status, body)] = exchange(store, b"GET /accounts/1 HTTP/1.1\r\nX-Pin: 1234\r\n\r\n")
+    finally:
+        store.close()
+    assert (status, body) == (500, {"error": "Internal error."})
+    assert "database.json is corrupt" in caplog.text
@@ -0,0 +1,18 @@
+from bankcore.bulk import import_accounts
+from bankcore.credentials import check_pin, is_hashed
+from bankcore.storage import open_store
+
+
+def test_import_hashes_pins_and_rejects_duplicates(database):
+    rows = [{"name": f"User {i}", "email": f"user{i}@example.com", "phone": f"98765{i:05d}", "pin": "1234"}
+            for i in range(30)]
+    rows.append(dict(rows[0], phone="9000000000"))
+    store = open_store(database, "journal").load()
+    try:
+        results = list(import_accounts(store, rows, chunk_size=8, workers=2))
+        assert [r["ok"] for r in results] == [True] * 30 + [False]
+        for result in results[:30]:
+            record = store.get(result["account"])
+            assert is_hashed(record.pin) and check_pin(record.pin, "1234")
+    finally:
+        store.close()
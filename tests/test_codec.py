@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from bankcore import codec
+from bankcore.storage import SnapshotStore, scan_snapshot
+
+TRICKY = [
+    {"name": "A, B [and] {C}", "email": "a@example.com", "Balance": 0},
+    {"name": "quote \" and backslash \\", "note": "]", "Balance": -5},
+    {"name": "Ünïcödé ₹", "nested": [1, [2, {"x": "]["}]], "Balance": 10 ** 12},
+    [],
+    "a string",
+    1.5,
+    None,
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, codec.CHUNK_SIZE])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_iter_array_matches_json_loads(chunk_size, indent):
+    text = json.dumps(TRICKY, indent=indent, ensure_ascii=False)
+    assert list(codec.iter_array(io.StringIO(text), chunk_size)) == TRICKY
+
+
+@pytest.mark.parametrize("text", ["", "  \n", "[]", " [ \n ] "])
+def test_iter_array_of_nothing(text):
+    assert list(codec.iter_array(io.StringIO(text), 2)) == []
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', '[{"a": 1}, {"b": ', '[1, 2'])
+def test_iter_array_rejects_what_isnt_an_array(text):
+    with pytest.raises(ValueError):
+        list(codec.iter_array(io.StringIO(text), 3))
+
+
+@pytest.mark.parametrize("compact_json", [False, True])
+def test_scan_reads_both_snapshot_layouts(database, create_accounts, compact_json):
+    store = SnapshotStore(database, compact_json=compact_json).load()
+    try:
+        accounts = create_accounts(store, 5)
+        assert [record.acc_no for record in scan_snapshot(database)] == [record.acc_no for record in store]
+        assert sorted(accounts) == sorted(record.acc_no for record in store)
+    finally:
+        store.close()
+    # Either layout loads back whatever the current setting is
+    store = SnapshotStore(database, compact_json=not compact_json).load()
+    try:
+        assert sorted(record.acc_no for record in store) == sorted(accounts)
+    finally:
+        store.close()
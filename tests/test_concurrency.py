@@ -0,0 +1,90 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from bankcore import service
+from bankcore.storage import STORE_MODES, open_store
+
+MODES = sorted(STORE_MODES)
+PROCESSES = 3
+THREADS = 2
+DEPOSITS = 10
+SIGNUPS = 10
+
+
+def deposit_many(database, mode, accounts):
+    """One process: a few threads, each depositing 1 into every account in turn."""
+    store = open_store(database, mode).load()
+
+    def run():
+        for _ in range(DEPOSITS):
+            for acc_no in accounts:
+                service.deposit(store, acc_no, "1234", 1)
+    threads = [threading.Thread(target=run) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_no_lost_updates_across_processes(database, create_accounts, mode):
+    store = open_store(database, mode).load()
+    accounts = create_accounts(store, 2)
+    store.close()
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=deposit_many, args=(database, mode, accounts))
+                 for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    store = open_store(database, mode).load()
+    try:
+        expected = PROCESSES * THREADS * DEPOSITS
+        assert [store.get(acc_no).balance for acc_no in accounts] == [expected, expected]
+        assert store.stats()["total_balance"] == 2 * expected
+    finally:
+        store.close()
+
+
+def create_same_contacts(database, mode, worker, barrier):
+    """One process: signs up the same emails, then the same phones, as every other process."""
+    store = open_store(database, mode).load()
+    barrier.wait()
+    for n in range(SIGNUPS):
+        for email, phone in ((f"same{n}@example.com", f"9{worker}{n:08d}"),
+                             (f"w{worker}.{n}@example.com", f"88888{n:05d}")):
+            try:
+                service.create_account(store, "A", email, phone, "1234")
+            except service.DuplicateError:
+                pass
+    store.close()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_no_duplicate_contacts_across_processes(database, mode):
+    open_store(database, mode).load().close()
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(PROCESSES)
+    processes = [context.Process(target=create_same_contacts, args=(database, mode, worker, barrier))
+                 for worker in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    store = open_store(database, mode).load()
+    try:
+        for n in range(SIGNUPS):
+            assert len(store.accounts_by_email(f"same{n}@example.com")) == 1
+            assert len(store.accounts_by_phone(f"88888{n:05d}")) == 1
+        assert len(store) == 2 * SIGNUPS
+    finally:
+        store.close()
@@ -0,0 +1,93 @@
+import pytest
+
+from bankcore import eod, service
+from bankcore.history import history_for
+from bankcore.storage import STORE_MODES, open_store
+
+MODES = sorted(STORE_MODES)
+# 36500 bps earns 1 a day per 100 held; under 1000 also pays a fee of 5
+RATES = (36500, 5, 1000)
+DEPOSITS = (300, 2000, 30000)
+EXPECTED = [300 + 3 - 5, 2000 + 20, 30000 + 300]
+
+
+class Crash(Exception):
+    pass
+
+
+def open_bank(database, mode, create_accounts):
+    store = open_store(database, mode).load()
+    accounts = create_accounts(store, len(DEPOSITS))
+    for acc_no, amount in zip(accounts, DEPOSITS):
+        service.deposit(store, acc_no, "1234", amount)
+    return store, accounts
+
+
+def crash_on_save(monkeypatch, stage, after):
+    """Makes the next save of ``stage`` fail just before or just after it is written."""
+    save = eod._save
+
+    def crashing(path, checkpoint, saved):
+        if saved == stage and not after:
+            raise Crash(stage)
+        save(path, checkpoint, saved)
+        if saved == stage and after:
+            raise Crash(stage)
+    monkeypatch.setattr(eod, "_save", crashing)
+
+
+def eod_entries(store, acc_no):
+    entries, _ = history_for(store).statement(acc_no)
+    return [(entry["kind"], entry["amount"]) for entry in entries if entry["kind"] in ("interest", "fee")]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("stage, after", [
+    (eod.COMPUTED, True),
+    (eod.APPLIED, False),
+    (eod.APPLIED, True),
+    (eod.DONE, True),
+])
+def test_end_of_day_resumes_after_a_crash(database, create_accounts, monkeypatch, mode, stage, after):
+    store, accounts = open_bank(database, mode, create_accounts)
+    crash_on_save(monkeypatch, stage, after)
+    with pytest.raises(Crash):
+        eod.run_end_of_day(store, "2026-10-17", RATES)
+    store.close()
+    monkeypatch.undo()
+
+    store = open_store(database, mode).load()
+    try:
+        if (stage, after) != (eod.COMPUTED, True):
+            # The balances were committed before the run could say so
+            assert [store.get(acc_no).balance for acc_no in accounts] == EXPECTED
+        result = eod.run_end_of_day(store, "2026-10-17", RATES)
+        assert result["stage"] == eod.DONE
+        assert result["skipped"] == []
+        assert [store.get(acc_no).balance for acc_no in accounts] == EXPECTED
+        assert eod_entries(store, accounts[0]) == [("interest", 3), ("fee", 5)]
+        assert eod_entries(store, accounts[2]) == [("interest", 300)]
+
+        # Done for the day: running again changes nothing
+        eod.run_end_of_day(store, "2026-10-17", RATES)
+        assert [store.get(acc_no).balance for acc_no in accounts] == EXPECTED
+        assert eod_entries(store, accounts[2]) == [("interest", 300)]
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_pending_run_finishes_before_the_next_date(database, create_accounts, monkeypatch, mode):
+    store, accounts = open_bank(database, mode, create_accounts)
+    crash_on_save(monkeypatch, eod.APPLIED, False)
+    with pytest.raises(Crash):
+        eod.run_end_of_day(store, "2026-10-16", RATES)
+    monkeypatch.undo()
+
+    result = eod.run_end_of_day(store, "2026-10-17", RATES)
+    try:
+        assert (result["date"], result["stage"]) == ("2026-10-17", eod.DONE)
+        assert store.get(accounts[2]).balance == 30000 + 300 + 303
+        assert eod_entries(store, accounts[2]) == [("interest", 300), ("interest", 303)]
+    finally:
+        store.close()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from bankcore import service, storage
+from bankcore.group_commit import GroupCommitter
+from bankcore.storage import JournalStore
+
+THREADS = 8
+DEPOSITS = 10
+
+
+def test_concurrent_appends_survive_a_reload(database, monkeypatch, create_accounts):
+    store = JournalStore(database, commit_window=0.005).load()
+    accounts = create_accounts(store, THREADS)
+    fsyncs = []
+    fsync = storage.os.fsync
+    monkeypatch.setattr(storage.os, "fsync", lambda fd: fsyncs.append(fd) or fsync(fd))
+    barrier = threading.Barrier(THREADS)
+
+    def run(acc_no):
+        barrier.wait()
+        for _ in range(DEPOSITS):
+            service.deposit(store, acc_no, "1234", 1)
+    threads = [threading.Thread(target=run, args=(acc_no,)) for acc_no in accounts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    monkeypatch.undo()
+
+    # Writers waiting in the same window shared an fsync
+    assert len(fsyncs) < THREADS * DEPOSITS
+    store = JournalStore(database).load()
+    try:
+        assert [store.get(acc_no).balance for acc_no in accounts] == [DEPOSITS] * THREADS
+    finally:
+        store.close()
+
+
+def test_every_writer_in_a_batch_sees_the_flush_error():
+    started = threading.Event()
+    release = threading.Event()
+    flushed = []
+
+    def flush(data, count):
+        if not started.is_set():
+            # Hold the first flush so the others queue up into one batch behind it
+            started.set()
+            release.wait()
+            flushed.append(data)
+            return
+        raise OSError("disk full")
+
+    committer = GroupCommitter(flush)
+    errors = []
+
+    def submit(data):
+        try:
+            committer.submit(data)
+        except OSError as err:
+            errors.append(err)
+    first = threading.Thread(target=submit, args=(b"a",))
+    first.start()
+    started.wait()
+    others = [threading.Thread(target=submit, args=(bytes([98 + i]),)) for i in range(3)]
+    for thread in others:
+        thread.start()
+    # Give the others time to join the open batch before the first flush ends
+    time.sleep(0.05)
+    release.set()
+    for thread in [first] + others:
+        thread.join()
+    assert flushed == [b"a"]
+    assert len(errors) == 3
+
+
+def test_batches_close_at_max_batch():
+    batches = []
+    committer = GroupCommitter(lambda data, count: batches.append(count), window=0.05, max_batch=4)
+    threads = [threading.Thread(target=committer.submit, args=(b"x",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(batches) == 8
+    assert max(batches) <= 4
+
+
+@pytest.mark.parametrize("window", [0.0, 0.01])
+def test_single_writer_returns_after_its_flush(window):
+    flushed = []
+    GroupCommitter(lambda data, count: flushed.append((data, count)), window).submit(b"one", 2)
+    assert flushed == [(b"one", 2)]
@@ -0,0 +1,70 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_server import BankAPI
+from bankcore import service
+from bankcore.history import TransactionHistory, history_path
+from bankcore.storage import open_store
+from bankcore.transactions import DEPOSIT, WITHDRAW
+
+
+@pytest.fixture
+def history(database):
+    history = TransactionHistory(history_path(database))
+    yield history
+    history.close()
+
+
+def pages(history, acc_no, limit, start=None, end=None):
+    """Every page of the statement, following the cursors."""
+    result = []
+    cursor = None
+    while True:
+        entries, cursor = history.statement(acc_no, start, end, cursor, limit)
+        result.append(entries)
+        if cursor is None:
+            return result
+
+
+def test_pages_neither_overlap_nor_skip_at_a_timestamp_tie(history):
+    history.record_many([("1001", DEPOSIT, n, n) for n in range(1, 8)], ts=100.0)
+    history.record_many([("1002", DEPOSIT, 99, 99)], ts=100.0)
+    history.record("1001", WITHDRAW, 1, 27, ts=50.0)
+    history.record("1001", DEPOSIT, 5, 33, ts=200.0)
+
+    expected = [(50.0, 1)] + [(100.0, n) for n in range(1, 8)] + [(200.0, 5)]
+    for limit in (1, 2, 3, 4, 9, 50):
+        walked = pages(history, "1001", limit)
+        assert [(entry["time"], entry["amount"]) for page in walked for entry in page] == expected
+        assert all(len(page) <= limit for page in walked)
+        assert len(walked) == max(1, -(-len(expected) // limit))
+    assert [entry["amount"] for entry in history.iter_statement("1001", page_size=2)] == [e[1] for e in expected]
+
+
+def test_range_includes_start_and_excludes_end(history):
+    for ts in (10.0, 20.0, 20.0, 30.0):
+        history.record("1001", DEPOSIT, int(ts), 0, ts=ts)
+    walked = pages(history, "1001", 1, start=20.0, end=30.0)
+    assert [entry["time"] for page in walked for entry in page] == [20.0, 20.0]
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "1.5", "1.5:x", "1:2:3"])
+def test_bad_cursor_is_a_400(database, create_accounts, cursor):
+    store = open_store(database, "journal").load()
+    try:
+        acc_no, = create_accounts(store, 1)
+        service.deposit(store, acc_no, "1234", 10)
+        with pytest.raises(service.BankError, match="cursor"):
+            service.get_statement(store, acc_no, "1234", cursor=cursor)
+
+        async def request():
+            with ThreadPoolExecutor(1) as executor:
+                return await BankAPI(store, executor).handle(
+                    "GET", f"/accounts/{acc_no}/statement?cursor={cursor}", {"x-pin": "1234"}, {})
+        with pytest.raises(service.BankError) as err:
+            asyncio.run(request())
+        assert err.value.status == 400
+    finally:
+        store.close()
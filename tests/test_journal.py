@@ -0,0 +1,67 @@
+import multiprocessing
+
+from bankcore import service
+from bankcore.storage import JournalStore
+
+WRITERS = 3
+DEPOSITS = 40
+COMPACT_EVERY = 7
+
+
+def test_torn_last_record_is_dropped_on_load(database, create_accounts):
+    store = JournalStore(database).load()
+    acc_no, = create_accounts(store, 1)
+    service.deposit(store, acc_no, "1234", 100)
+    store.close()
+    with open(store.log_path, 'rb') as fs:
+        complete = fs.read()
+
+    # A crash in the middle of appending the next deposit
+    with open(store.log_path, 'ab') as fs:
+        fs.write(b'{"op": "put", "record": {"Account no.": "' + acc_no.encode())
+
+    store = JournalStore(database).load()
+    try:
+        assert store.get(acc_no).balance == 100
+        with open(store.log_path, 'rb') as fs:
+            assert fs.read() == complete
+        # Appends after the cut are replayed as usual
+        service.deposit(store, acc_no, "1234", 50)
+    finally:
+        store.close()
+    store = JournalStore(database).load()
+    try:
+        assert store.get(acc_no).balance == 150
+    finally:
+        store.close()
+
+
+def append_deposits(database, acc_no):
+    store = JournalStore(database, compact_every=COMPACT_EVERY).load()
+    for _ in range(DEPOSITS):
+        service.deposit(store, acc_no, "1234", 1)
+    store.close()
+
+
+def test_compaction_while_other_processes_append(database, create_accounts):
+    store = JournalStore(database).load()
+    acc_no, = create_accounts(store, 1)
+    store.close()
+
+    # Every writer compacts every few records, under the others' appends
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=append_deposits, args=(database, acc_no)) for _ in range(WRITERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    with open(store.log_path, 'rb') as fs:
+        assert len(fs.readlines()) < COMPACT_EVERY
+    store = JournalStore(database).load()
+    try:
+        assert store.get(acc_no).balance == WRITERS * DEPOSITS
+        assert store.stats()["credits"] == WRITERS * DEPOSITS
+    finally:
+        store.close()
@@ -0,0 +1,84 @@
+import pytest
+
+from bankcore import service
+from bankcore.ledger import INITIAL_SLOTS, BalanceLedger
+from bankcore.storage import LedgerStore, ledger_path
+
+
+@pytest.fixture
+def ledgers(database):
+    """Two ledgers on the same file, as two processes would have."""
+    first = BalanceLedger(ledger_path(database)).open()
+    second = BalanceLedger(ledger_path(database)).open()
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_balances_are_shared_and_survive_a_reopen(database, ledgers):
+    first, second = ledgers
+    first.set_many([("1001", 500), ("1002", -20)])
+    assert (second.balance("1001"), second.balance("1002")) == (500, -20)
+    second.set("1001", 750)
+    assert first.balance("1001") == 750
+    first.close()
+
+    reopened = BalanceLedger(ledger_path(database)).open()
+    try:
+        assert [reopened.balance(acc_no) for acc_no in ("1001", "1002", "1003")] == [750, -20, None]
+        assert len(reopened) == 2
+    finally:
+        reopened.close()
+
+
+def test_deleted_slot_is_never_handed_to_another_account(ledgers):
+    first, second = ledgers
+    first.set_many([("1001", 100), ("1002", 200)])
+    assert second.balance("1001") == 100
+    assert first.remove("1001")
+    assert not first.remove("1001")
+    # The other process's cached slot no longer matches, so it reads nothing
+    assert second.balance("1001") is None
+    assert len(second) == 1
+
+    # The same number comes back in a fresh slot; the freed one stays empty
+    second.set("1001", 5)
+    second.set("1003", 300)
+    assert (first.balance("1001"), first.balance("1002"), first.balance("1003")) == (5, 200, 300)
+    assert len(first) == 3
+
+
+def test_ledger_grows_past_its_initial_size(ledgers):
+    first, second = ledgers
+    first.set_many([(str(10000 + i), i) for i in range(INITIAL_SLOTS + 10)])
+    assert second.balance(str(10000 + INITIAL_SLOTS + 9)) == INITIAL_SLOTS + 9
+    assert len(second) == INITIAL_SLOTS + 10
+    with pytest.raises(TypeError):
+        first.set("1", 1.5)
+
+
+def test_ledger_store_reopen_and_recreate(database, create_accounts):
+    store = LedgerStore(database).load()
+    accounts = create_accounts(store, 3)
+    service.deposit(store, accounts[0], "1234", 400)
+    service.deposit(store, accounts[1], "1234", 900)
+    service.delete_account(store, accounts[1], "1234")
+    store.close()
+
+    store = LedgerStore(database).load()
+    try:
+        assert [store.balance(acc_no) for acc_no in accounts] == [400, None, 0]
+        assert store.get(accounts[1]) is None
+        # A record saved under the deleted number starts from its own balance
+        record = store.get(accounts[0]).copy()
+        record.acc_no, record.email, record.phone = accounts[1], "new@example.com", 9000000000
+        store.put(record)
+        assert store.get(accounts[1]).balance == 400
+        assert store.stats()["total_balance"] == 800
+    finally:
+        store.close()
+    store = LedgerStore(database).load()
+    try:
+        assert [store.get(acc_no).balance for acc_no in accounts] == [400, 400, 0]
+    finally:
+        store.close()
@@ -0,0 +1,64 @@
+import pytest
+
+from bankcore import service
+from bankcore.storage import open_store
+from main import Bank
+
+
+def test_rejected_update_leaves_the_record_alone(database, monkeypatch):
+    store = open_store(database, "journal").load()
+    monkeypatch.setattr(Bank, "data", store)
+    try:
+        first = service.create_account(store, "A", "a@example.com", "9876500001", "1234")
+        service.create_account(store, "B", "b@example.com", "9876500002", "1234")
+        stored_pin = first.pin
+        answers = iter([first.acc_no, "1234", "", "b@example.com", "9876500003", "5678"])
+        monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+        Bank().update_details()
+
+        record = store.get(first.acc_no)
+        assert (record.email, record.phone, record.pin) == ("a@example.com", 9876500001, stored_pin)
+        assert list(store.accounts_by_phone("9876500003")) == []
+        assert list(store.accounts_by_email("a@example.com")) == [first.acc_no]
+    finally:
+        store.close()
+
+
+def test_failed_deposit_leaves_memory_as_on_disk(database, monkeypatch, create_accounts):
+    store = open_store(database, "journal").load()
+    monkeypatch.setattr(Bank, "data", store)
+    try:
+        acc_no, = create_accounts(store, 1)
+        answers = iter([acc_no, "1234", "500"])
+        monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+        def fail(record):
+            raise OSError("disk full")
+        monkeypatch.setattr(store, "put", fail)
+        with pytest.raises(OSError):
+            Bank().deposite_money()
+        assert store.get(acc_no).balance == 0
+    finally:
+        store.close()
+
+
+def test_withdraw_from_an_account_deleted_meanwhile(database, monkeypatch, capsys, create_accounts):
+    store = open_store(database, "journal").load()
+    monkeypatch.setattr(Bank, "data", store)
+    try:
+        acc_no, = create_accounts(store, 1)
+
+        def answer(prompt=""):
+            if "amount" in prompt:
+                # Another session closes the account before the amount is entered
+                store.delete(acc_no)
+                return "100"
+            return next(answers)
+        answers = iter([acc_no, "1234"])
+        monkeypatch.setattr("builtins.input", answer)
+        Bank().withdraw_money()
+        assert capsys.readouterr().out.endswith("user not found\n")
+        assert store.get(acc_no) is None
+    finally:
+        store.close()
@@ -0,0 +1,66 @@
+import pytest
+
+from bankcore import service, sessions as sessions_module
+from bankcore.sessions import SessionCache
+from bankcore.storage import open_store
+
+
+@pytest.fixture
+def store(database):
+    store = open_store(database, "journal").load()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the sessions' monotonic clock with one the test moves."""
+    now = [1000.0]
+    monkeypatch.setattr(sessions_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_session_expires_after_idle_ttl(store, clock, create_accounts):
+    acc_no, = create_accounts(store, 1)
+    cache = SessionCache(ttl=60)
+    token = cache.open(store.get(acc_no))
+
+    clock[0] += 59
+    assert cache.account(store, token).acc_no == acc_no
+    # Using the session pushed its expiry out again
+    clock[0] += 59
+    assert cache.account(store, token).acc_no == acc_no
+    clock[0] += 60
+    assert cache.account(store, token) is None
+    assert len(cache) == 0
+
+
+def test_pin_change_and_delete_end_sessions(store, clock, create_accounts):
+    first, second = create_accounts(store, 2)
+    cache = SessionCache()
+    token = cache.open(store.get(first))
+    other = cache.open(store.get(second))
+
+    # Other profile changes keep the session
+    service.update_details(store, first, "1234", name="Renamed")
+    assert cache.account(store, token).name == "Renamed"
+    service.update_details(store, first, "1234", new_pin="4321")
+    assert cache.account(store, token) is None
+    assert cache.account(store, cache.open(store.get(first))).acc_no == first
+
+    service.delete_account(store, second, "1234")
+    assert cache.account(store, other) is None
+
+
+def test_least_recently_used_session_goes_first(store, clock, create_accounts):
+    accounts = create_accounts(store, 3)
+    cache = SessionCache(max_sessions=2)
+    tokens = [cache.open(store.get(accounts[0])), cache.open(store.get(accounts[1]))]
+    clock[0] += 1
+    cache.account(store, tokens[0])
+    tokens.append(cache.open(store.get(accounts[2])))
+    assert [cache.account(store, token) is not None for token in tokens] == [True, False, True]
+
+    cache.close(tokens[0])
+    assert cache.account(store, tokens[0]) is None
+    assert cache.account(store, "not-a-token") is None
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from bankcore import service
+from bankcore.shards import ShardPool, ShardedStore, rebalance
+from bankcore.storage import open_store
+
+
+def test_two_stores_on_the_same_shards_reject_duplicates(database):
+    first = ShardedStore(database, shards=4).load()
+    second = ShardedStore(database).load()
+    try:
+        # Enough accounts that some duplicates would land in another shard
+        for n in range(8):
+            creator, other = (first, second) if n % 2 else (second, first)
+            service.create_account(creator, "A", f"x{n}@example.com", f"98765000{n:02d}", "1234")
+            with pytest.raises(service.DuplicateError, match="email"):
+                service.create_account(other, "B", f"X{n}@example.com", f"98765001{n:02d}", "1234")
+            with pytest.raises(service.DuplicateError, match="phone"):
+                service.create_account(other, "B", f"y{n}@example.com", f"98765000{n:02d}", "1234")
+        assert len(first) == len(second) == 8
+    finally:
+        first.close()
+        second.close()
+
+
+def test_threads_creating_the_same_email_in_a_sharded_store(database):
+    store = ShardedStore(database, shards=4).load()
+    created = []
+    barrier = threading.Barrier(8)
+
+    def signup(worker):
+        barrier.wait()
+        for n in range(4):
+            try:
+                created.append(service.create_account(store, "A", f"same{n}@example.com",
+                                                      f"98765{worker:02d}{n:03d}", "1234"))
+            except service.DuplicateError:
+                pass
+    threads = [threading.Thread(target=signup, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert sorted(account.email for account in created) == [f"same{n}@example.com" for n in range(4)]
+    finally:
+        store.close()
+
+
+@pytest.fixture
+def pool(database):
+    ShardedStore(database, shards=4).load().close()
+    with ShardPool(database, workers=2) as pool:
+        yield pool
+
+
+def test_pool_rejects_duplicates_across_workers(pool):
+    first = pool.call("create_account", "A", "dup@example.com", "9876543210", "1234")
+    # Creates go to the workers in turn, so these run in the other worker
+    with pytest.raises(service.DuplicateError, match="email"):
+        pool.call("create_account", "B", "DUP@example.com ", "9876500000", "1234")
+    with pytest.raises(service.DuplicateError, match="phone"):
+        pool.call("create_account", "B", "other@example.com", "9876543210", "1234")
+
+    second = pool.call("create_account", "B", "b@example.com", "9876500001", "1234")
+    with pytest.raises(service.DuplicateError):
+        pool.call("update_details", second.acc_no, "1234", None, "dup@example.com")
+    assert pool.call("details", second.acc_no, "1234").email == "b@example.com"
+
+    pool.call("delete_account", first.acc_no, "1234")
+    pool.call("update_details", second.acc_no, "1234", None, "dup@example.com")
+    assert pool.call("details", second.acc_no, "1234").email == "dup@example.com"
+
+
+def test_pool_claims_keys_of_calls_in_flight(pool):
+    futures = [pool.submit("create_account", "A", "same@example.com", f"98765000{i:02d}", "1234")
+               for i in range(4)]
+    outcomes = [future.exception() for future in futures]
+    assert sum(error is None for error in outcomes) == 1
+    assert all(isinstance(error, service.DuplicateError) for error in outcomes if error is not None)
+
+
+def test_pool_recovers_accounts(pool):
+    created = [pool.call("create_account", "A", f"a{i}@example.com", f"98765000{i:02d}", "1234")
+               for i in range(4)]
+    for account in created:
+        assert pool.call("recover_account", account.email, "1234").acc_no == account.acc_no
+    with pytest.raises(service.AuthError):
+        pool.call("recover_account", "nobody@example.com", "1234")
+
+
+@pytest.mark.parametrize("source", ["snapshot", "journal", "sqlite", "ledger"])
+def test_rebalance_reads_the_source_mode(database, create_accounts, source):
+    store = open_store(database, source).load()
+    accounts = create_accounts(store, 6)
+    for amount, acc_no in enumerate(accounts, start=1):
+        service.deposit(store, acc_no, "1234", 100 * amount)
+    store.close()
+
+    assert rebalance(database, 2, source=source) == 6
+    sharded = ShardedStore(database).load()
+    try:
+        assert [sharded.get(acc_no).balance for acc_no in accounts] == [100, 200, 300, 400, 500, 600]
+        assert sharded.stats()["credited"] == 2100
+        assert len(list(service.get_statement(sharded, accounts[0], "1234")[0])) == 1
+    finally:
+        sharded.close()
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from bankcore import service, storage
+from bankcore.storage import SnapshotStore
+
+
+def test_failed_write_keeps_the_old_snapshot(database, create_accounts, monkeypatch):
+    store = SnapshotStore(database).load()
+    acc_no, = create_accounts(store, 1)
+    service.deposit(store, acc_no, "1234", 100)
+    with open(database, 'rb') as fs:
+        before = fs.read()
+
+    def crash(fd):
+        raise OSError("disk gone")
+    monkeypatch.setattr(storage.os, "fsync", crash)
+    with pytest.raises(OSError):
+        service.deposit(store, acc_no, "1234", 50)
+    monkeypatch.undo()
+    store.close()
+
+    with open(database, 'rb') as fs:
+        assert fs.read() == before
+    assert [name for name in os.listdir(os.path.dirname(database)) if name.endswith(".tmp")] == []
+    store = SnapshotStore(database).load()
+    assert store.get(acc_no).balance == 100
+    store.close()
+
+
+def test_unchanged_accounts_reuse_their_encoding(database, create_accounts):
+    store = SnapshotStore(database).load()
+    accounts = create_accounts(store, 3)
+    cached = dict(store._encoded)
+    service.deposit(store, accounts[0], "1234", 100)
+    try:
+        assert store._encoded[accounts[0]] is not cached[accounts[0]]
+        assert all(store._encoded[acc_no] is cached[acc_no] for acc_no in accounts[1:])
+        # Still exactly what json.dump(indent=4) writes
+        with open(database) as fs:
+            text = fs.read()
+        assert text == json.dumps(json.loads(text), indent=4)
+    finally:
+        store.close()